@@ -0,0 +1,123 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+GENDERS = ['MALE', 'FEMALE']
+
+# Days of heart-rate samples generated and written at a time
+HR_WRITE_DAYS = 30
+
+
+def _score(rng, days, mean, spread):
+    """Scores that drift slowly around mean, as Oura's daily scores do"""
+    walk = np.convolve(rng.normal(0, spread, days + 6), np.ones(7) / 7, mode='valid')
+    return np.clip(np.round(mean + walk + rng.normal(0, spread / 2, days)), 0, 100).astype(int)
+
+
+def _write_daily(path, columns):
+    pd.DataFrame(columns).to_csv(path, index=False)
+
+
+def _write_heart_rate(path, rng, start, days, interval_minutes):
+    """Write the heart-rate export a month at a time so memory stays bounded"""
+    samples_per_day = 24 * 60 // interval_minutes
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('timestamp,bpm,source\n')
+        for offset in range(0, days, HR_WRITE_DAYS):
+            n_days = min(HR_WRITE_DAYS, days - offset)
+            timestamps = pd.date_range(start + pd.Timedelta(days=offset), periods=n_days * samples_per_day,
+                                       freq=f'{interval_minutes}min', tz='UTC')
+            hours = timestamps.hour.to_numpy() + timestamps.minute.to_numpy() / 60
+            asleep = (hours < 6) | (hours >= 23)
+            base = np.where(asleep, 55, 72) + rng.normal(0, 4, len(timestamps))
+            # Occasional workouts: short bursts of elevated heart rate during the day
+            bursts = (~asleep) & (rng.random(len(timestamps)) < 0.02)
+            bpm = np.clip(np.round(base + bursts * rng.uniform(40, 90, len(timestamps))), 35, 200).astype(int)
+            pd.DataFrame({
+                'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+                'bpm': bpm,
+                'source': np.where(asleep, 'rest', np.where(bursts, 'workout', 'awake'))
+            }).to_csv(f, header=False, index=False)
+
+
+def generate_user(user_dir, days, seed=0, end='2025-01-01', hr_interval=5):
+    """Write one user's synthetic exports covering the `days` days before end"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(user_dir, exist_ok=True)
+    start = pd.Timestamp(end) - pd.Timedelta(days=days)
+    day = pd.date_range(start, periods=days, freq='D').strftime('%Y-%m-%d')
+    export_ts = pd.Timestamp(end).strftime('%Y-%m-%dT%H-%M-%S')
+
+    def path(dataset):
+        return os.path.join(user_dir, f'oura_{dataset}_{export_ts}.csv')
+
+    _write_daily(path('daily-readiness'), {
+        'id': np.arange(days), 'day': day, 'score': _score(rng, days, 78, 8),
+        'temperature_deviation': np.round(rng.normal(0, 0.3, days), 2),
+        'contributors_activity_balance': _score(rng, days, 80, 8),
+        'contributors_body_temperature': _score(rng, days, 90, 6),
+        'contributors_hrv_balance': _score(rng, days, 75, 10),
+        'contributors_previous_day_activity': _score(rng, days, 80, 8),
+        'contributors_previous_night': _score(rng, days, 78, 10),
+        'contributors_recovery_index': _score(rng, days, 75, 12),
+        'contributors_resting_heart_rate': _score(rng, days, 80, 10),
+        'contributors_sleep_balance': _score(rng, days, 80, 8)
+    })
+    _write_daily(path('daily-sleep'), {
+        'id': np.arange(days), 'day': day, 'score': _score(rng, days, 76, 9),
+        'contributors_deep_sleep': _score(rng, days, 80, 12),
+        'contributors_efficiency': _score(rng, days, 85, 8),
+        'contributors_latency': _score(rng, days, 80, 12),
+        'contributors_rem_sleep': _score(rng, days, 75, 12),
+        'contributors_restfulness': _score(rng, days, 70, 10),
+        'contributors_timing': _score(rng, days, 85, 10),
+        'contributors_total_sleep': _score(rng, days, 78, 10)
+    })
+    _write_daily(path('daily-activity'), {
+        'id': np.arange(days), 'day': day, 'score': _score(rng, days, 74, 10),
+        'steps': rng.gamma(6, 1400, days).astype(int),
+        'average_met_minutes': np.round(rng.normal(1.6, 0.3, days), 3),
+        'total_calories': rng.normal(2400, 250, days).astype(int),
+        'high_activity_time': rng.integers(0, 3600, days),
+        'medium_activity_time': rng.integers(0, 5400, days),
+        'low_activity_time': rng.integers(3600, 18000, days),
+        'sedentary_time': rng.integers(18000, 36000, days),
+        'resting_time': rng.integers(25000, 32000, days),
+        'non_wear_time': rng.integers(0, 3600, days)
+    })
+    spo2 = np.round(rng.normal(96.5, 1.2, days), 3)
+    spo2[rng.random(days) < 0.05] = np.nan  # nights without a reading
+    _write_daily(path('daily-spo2'), {'id': np.arange(days), 'day': day, 'spo2_percentage': spo2})
+    _write_heart_rate(path('heart-rate'), rng, start, days, hr_interval)
+
+
+def generate_archive(output_dir, days, users=1, seed=0, hr_interval=5):
+    """Write `users` profiles into output_dir; returns their directories"""
+    user_dirs = []
+    for i in range(users):
+        rng = np.random.default_rng(seed + i)
+        gender = GENDERS[i % len(GENDERS)]
+        height, weight = rng.integers(5, 7), rng.integers(110, 240)
+        user_dir = os.path.join(output_dir, f'{gender}_{height}_FT_{weight}_LB_{i:04d}')
+        generate_user(user_dir, days, seed=seed + i, hr_interval=hr_interval)
+        user_dirs.append(user_dir)
+    return user_dirs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Oura exports for benchmarking.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--days', type=int, default=365, help="days of history per user (30 to 3650)")
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hr-interval', type=int, default=5, help="minutes between heart-rate samples")
+    args = parser.parse_args()
+
+    for user_dir in generate_archive(args.output_dir, args.days, args.users, args.seed, args.hr_interval):
+        print(f"Generated {user_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from data_loader import CACHE_DIR, HR_CHUNKSIZE, load_user_data, preprocess_data  # noqa: E402
+from data_analyzer import analyze_data  # noqa: E402
+from recommendation_engine import evaluate_rules, generate_recommendations  # noqa: E402
+from report_generator import generate_health_report  # noqa: E402
+from pipeline import run_pipeline  # noqa: E402
+from generate_data import generate_archive  # noqa: E402
+
+warnings.filterwarnings('ignore')
+
+
+def _timed(func, repeat, setup=None):
+    """Run func `repeat` times (after setup, untimed) and return the wall times"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_user(user_dir, repeat):
+    """Time each pipeline function for one user; returns {function: [seconds, ...]}"""
+    cache_dir = os.path.join(user_dir, CACHE_DIR)
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def load():
+        return load_user_data(user_dir, hr_chunksize=HR_CHUNKSIZE)
+
+    timings = {'load_user_data (cold)': _timed(load, repeat, setup=clear_cache)}
+    timings['load_user_data (warm)'] = _timed(load, repeat)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = load()
+        processed = preprocess_data(data)
+        merged_df, recent_df = analyze_data(processed)
+        recommendations, alerts, insights = generate_recommendations(merged_df, recent_df, processed)
+
+    timings['preprocess_data'] = _timed(lambda: preprocess_data(data), repeat)
+    timings['analyze_data'] = _timed(lambda: analyze_data(processed), repeat)
+    timings['evaluate_rules (all days)'] = _timed(lambda: evaluate_rules(merged_df), repeat)
+    timings['generate_recommendations'] = _timed(
+        lambda: generate_recommendations(merged_df, recent_df, processed), repeat)
+    timings['generate_health_report'] = _timed(
+        lambda: generate_health_report(merged_df, recent_df, recommendations, alerts, insights), repeat)
+    timings['run_pipeline (warm)'] = _timed(lambda: run_pipeline(user_dir), repeat)
+    return timings
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(day_counts, users, repeat, data_dir, hr_interval):
+    results = []
+    for days in day_counts:
+        archive = os.path.join(data_dir, f'{days}d')
+        if not os.path.isdir(archive):
+            print(f"Generating {users} user(s) with {days} days of history...")
+            generate_archive(archive, days, users, hr_interval=hr_interval)
+        for user_dir in sorted(os.listdir(archive)):
+            for function, times in benchmark_user(os.path.join(archive, user_dir), repeat).items():
+                results.append({'days': days, 'user': user_dir, 'function': function, 'repeat': repeat,
+                                'min_s': min(times), 'median_s': statistics.median(times)})
+                print(f"{days:>6}d  {function:<32} min {min(times):9.4f}s  median {statistics.median(times):9.4f}s")
+    return results
+
+
+def compare(results, baseline_path):
+    """Print median-time ratios against a previous results file"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['days'], r['user'], r['function']): r['median_s'] for r in baseline['results']}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    for r in results:
+        old = previous.get((r['days'], r['user'], r['function']))
+        if old:
+            print(f"{r['days']:>6}d  {r['function']:<32} {old:9.4f}s -> {r['median_s']:9.4f}s  x{old / r['median_s']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline function on synthetic Oura exports.")
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365, 3650], help="history lengths to benchmark")
+    parser.add_argument('--users', type=int, default=1, help="users generated per history length")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--hr-interval', type=int, default=5, help="minutes between heart-rate samples")
+    parser.add_argument('--data-dir', help="reuse generated exports from this directory (default: a temporary one)")
+    parser.add_argument('--output', default=f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='naplett_bench_')
+    try:
+        results = run_benchmarks(args.days, args.users, args.repeat, data_dir, args.hr_interval)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            'commit': _commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'hr_interval_minutes': args.hr_interval,
+            'results': results
+        }, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
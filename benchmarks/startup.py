@@ -0,0 +1,56 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Commands that must start without the data stack; their total import time (interpreter
+# startup included) is held to the budget
+COMMANDS = [['--help'], ['--list'], ['--start', 'not-a-date']]
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow']
+IMPORT_BUDGET_MS = 100
+
+
+def measure(args, python=sys.executable):
+    """Run main.py under `python -X importtime`; returns (wall seconds, import ms, imported module names)"""
+    start = time.perf_counter()
+    result = subprocess.run([python, '-X', 'importtime', 'main.py', *args], cwd=SRC_DIR,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    import_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        import_us += int(self_us)
+        modules.add(name.strip())
+    return wall, import_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check main.py startup time with python -X importtime.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS, help="maximum total import time")
+    args = parser.parse_args()
+
+    failed = False
+    for command in COMMANDS:
+        runs = [measure(command) for _ in range(args.repeat)]
+        wall = statistics.median(run[0] for run in runs) * 1000
+        imports = statistics.median(run[1] for run in runs)
+        heavy = sorted(m for m in runs[0][2] if m.split('.')[0] in HEAVY_MODULES)
+        ok = imports <= args.budget_ms and not heavy
+        failed |= not ok
+        print(f"main.py {' '.join(command):<24} wall {wall:7.1f} ms  imports {imports:6.1f} ms  "
+              f"{'ok' if ok else 'FAIL'}{'  heavy imports: ' + ', '.join(heavy) if heavy else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
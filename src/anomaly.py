@@ -0,0 +1,147 @@
+import json
+import math
+import os
+
+import pandas as pd
+
+from data_loader import CACHE_DIR
+
+ANOMALY_STATE_FILE = 'anomaly_state.json'
+ANOMALY_STATE_VERSION = 1
+
+# merged_df column -> label used in alerts
+ANOMALY_METRICS = {
+    'score': 'readiness score',
+    'score_sleep': 'sleep score',
+    'score_activity': 'activity score',
+    'contributors_hrv_balance': 'HRV balance',
+    'contributors_resting_heart_rate': 'resting heart rate score',
+    'spo2_percentage': 'blood oxygen level',
+    'avg_hr': 'average heart rate'
+}
+
+# Days averaged with equal weight before switching to the exponentially weighted baseline
+WARMUP_DAYS = 14
+EWMA_ALPHA = 2 / (28 + 1)  # 28-day span
+
+Z_THRESHOLD = 3.0
+# Two-sided CUSUM on standardized residuals: slack per day and decision threshold
+CUSUM_SLACK = 0.5
+CUSUM_THRESHOLD = 5.0
+
+
+def anomaly_state_path(user_dir):
+    """Location of the persisted anomaly detector state for a user"""
+    return os.path.join(user_dir, CACHE_DIR, ANOMALY_STATE_FILE)
+
+
+def _new_metric_state():
+    return {'n': 0, 'mean': 0.0, 'var': 0.0, 'cusum_pos': 0.0, 'cusum_neg': 0.0}
+
+
+def update_metric(state, value):
+    """Score one observation against the baseline, then fold it in; O(1).
+
+    Returns (zscore, shift) where shift is 'up'/'down' when the CUSUM detects
+    a sustained change, else None. zscore is None until the baseline is warm.
+    """
+    zscore, shift = None, None
+    if state['n'] >= WARMUP_DAYS and state['var'] > 0:
+        zscore = (value - state['mean']) / math.sqrt(state['var'])
+        state['cusum_pos'] = max(0.0, state['cusum_pos'] + zscore - CUSUM_SLACK)
+        state['cusum_neg'] = max(0.0, state['cusum_neg'] - zscore - CUSUM_SLACK)
+        if state['cusum_pos'] > CUSUM_THRESHOLD or state['cusum_neg'] > CUSUM_THRESHOLD:
+            shift = 'up' if state['cusum_pos'] > CUSUM_THRESHOLD else 'down'
+            state['cusum_pos'] = state['cusum_neg'] = 0.0
+
+    state['n'] += 1
+    delta = value - state['mean']
+    if state['n'] <= WARMUP_DAYS:
+        # Welford: exact running mean and (population) variance while warming up
+        state['mean'] += delta / state['n']
+        state['var'] += (delta * (value - state['mean']) - state['var']) / state['n']
+    else:
+        increment = EWMA_ALPHA * delta
+        state['mean'] += increment
+        state['var'] = (1 - EWMA_ALPHA) * (state['var'] + delta * increment)
+    return zscore, shift
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == ANOMALY_STATE_VERSION:
+            return state
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable anomaly state {state_path}: {e}")
+    return None
+
+
+def _save_state(state_path, state):
+    try:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+    except Exception as e:
+        print(f"Warning: Could not save anomaly state: {e}")
+
+
+def detect_anomalies(merged_df, state_path=None):
+    """Flag z-score outliers and sustained shifts on the latest day of merged_df.
+
+    Per-metric baselines are folded forward only with days after the last one
+    committed and persisted to state_path, so history is never rescanned. The
+    latest day is scored against a copy and committed only once a later day
+    arrives, since its export may still be partial. Returns a list of anomaly
+    dicts for the latest day.
+    """
+    state = _load_state(state_path) if state_path else None
+    last_day = merged_df['day'].max().strftime('%Y-%m-%d')
+    if state is not None and state['committed_day'] >= last_day:
+        state = None  # the exports were replaced by an older history: start over
+    if state is None:
+        state = {'version': ANOMALY_STATE_VERSION, 'committed_day': '', 'metrics': {}}
+
+    columns = [col for col in ANOMALY_METRICS if col in merged_df.columns]
+    new_days = merged_df[merged_df['day'] > pd.Timestamp(state['committed_day'])] if state['committed_day'] else merged_df
+    anomalies = []
+    for row in new_days[['day', *columns]].itertuples(index=False):
+        day = row[0].strftime('%Y-%m-%d')
+        for col, value in zip(columns, row[1:]):
+            if pd.isna(value):
+                continue
+            metric_state = state['metrics'].setdefault(col, _new_metric_state())
+            if day != last_day:
+                update_metric(metric_state, float(value))
+                continue
+            zscore, shift = update_metric(dict(metric_state), float(value))
+            if zscore is not None and abs(zscore) >= Z_THRESHOLD:
+                anomalies.append({'day': day, 'metric': col, 'kind': 'spike', 'value': float(value),
+                                  'zscore': zscore, 'direction': 'up' if zscore > 0 else 'down'})
+            elif shift:
+                anomalies.append({'day': day, 'metric': col, 'kind': 'shift', 'value': float(value),
+                                  'zscore': zscore, 'direction': shift})
+        if day != last_day:
+            state['committed_day'] = day
+
+    if state_path:
+        _save_state(state_path, state)
+    return anomalies
+
+
+def anomaly_alerts(anomalies):
+    """Alert messages for detected anomalies"""
+    alerts = []
+    for anomaly in anomalies:
+        label = ANOMALY_METRICS.get(anomaly['metric'], anomaly['metric'])
+        if anomaly['kind'] == 'spike':
+            side = 'above' if anomaly['direction'] == 'up' else 'below'
+            alerts.append(f"⚠️ Your {label} of {anomaly['value']:g} is unusually far {side} your "
+                          f"personal baseline ({abs(anomaly['zscore']):.1f} standard deviations).")
+        else:
+            trend = 'upward' if anomaly['direction'] == 'up' else 'downward'
+            alerts.append(f"⚠️ Your {label} has shifted {trend} over recent days compared to your baseline.")
+    return alerts
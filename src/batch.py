@@ -0,0 +1,108 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import ARCHIVE_PATH, discover_user_directories, open_report_bundle, save_report, write_report_line
+from pipeline import analyze_user, build_report
+from report_generator import RENDERERS, render_report
+
+REPORTS_PATH = os.path.join("..", "reports")
+
+warnings.filterwarnings('ignore')
+
+
+def process_user(user_dir, reports_dir, fmt='text', structured=False):
+    """Run the pipeline for one user; failures are captured, never raised.
+
+    The report is saved under reports_dir in the given format, or, with
+    structured set, returned as a dict for the caller to bundle.
+    """
+    user = os.path.basename(user_dir)
+    result = {'user': user, 'status': 'ok', 'report_file': None, 'report': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        # Per-stage progress output from parallel workers would interleave, so it is discarded
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = build_report(*analyze_user(user_dir), user_dir=user_dir)
+        if report is None:
+            result['status'] = 'skipped'
+            result['error'] = "Insufficient data for analysis."
+        elif structured:
+            result['report'] = report.to_dict()
+        else:
+            result['report_file'] = save_report(render_report(report, fmt), reports_dir, RENDERERS[fmt][1])
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_batch(archive_path=ARCHIVE_PATH, reports_path=REPORTS_PATH, workers=None, fmt='text', bundle_path=None):
+    """Generate reports for every user directory under archive_path in a process pool.
+
+    With bundle_path set, reports are streamed into that single JSON Lines
+    file (gzip-compressed for .gz) as they complete, instead of one file per user.
+    """
+    user_dirs = discover_user_directories(archive_path)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            (open_report_bundle(bundle_path) if bundle_path else contextlib.nullcontext()) as bundle:
+        futures = {executor.submit(process_user, user_dir, os.path.join(reports_path, os.path.basename(user_dir)),
+                                   fmt, bundle is not None): user_dir
+                   for user_dir in user_dirs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = {'user': os.path.basename(futures[future]), 'status': 'error', 'report_file': None,
+                          'report': None, 'error': f"{type(e).__name__}: {e}", 'seconds': None}
+            report = result.pop('report')
+            if report is not None:
+                write_report_line(bundle, report)
+                result['report_file'] = bundle_path
+            print(f"[{result['status']}] {result['user']}")
+            results.append(result)
+
+    return sorted(results, key=lambda r: r['user'])
+
+
+def print_summary(results, elapsed):
+    """Print per-user status and timings for a batch run"""
+    print("\n" + "=" * 80)
+    print("BATCH SUMMARY")
+    print("=" * 80)
+    for result in results:
+        seconds = f"{result['seconds']:.2f}s" if result['seconds'] is not None else "-"
+        detail = result['report_file'] or result['error']
+        print(f"{result['user']:<40} {result['status']:<8} {seconds:>8}  {detail}")
+    counts = {status: sum(r['status'] == status for r in results) for status in ['ok', 'skipped', 'error']}
+    print("-" * 80)
+    print(f"{len(results)} users in {elapsed:.2f}s: {counts['ok']} ok, {counts['skipped']} skipped, {counts['error']} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate health reports for every user profile in the archive.")
+    parser.add_argument('--archive', default=ARCHIVE_PATH, help="directory containing one folder per user")
+    parser.add_argument('--reports', default=REPORTS_PATH, help="directory to write per-user reports into")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--format', choices=list(RENDERERS), default='text', help="format of per-user report files")
+    parser.add_argument('--bundle', help="write all reports into this JSON Lines file (.jsonl or .jsonl.gz) instead")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.archive):
+        print(f"Error: {args.archive} directory not found.")
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(args.archive, args.reports, args.workers, args.format, args.bundle)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all(r['status'] != 'error' for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
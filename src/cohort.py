@@ -0,0 +1,202 @@
+import argparse
+import bisect
+import contextlib
+import io
+import json
+import os
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils import ARCHIVE_PATH, discover_user_directories, is_missing, parse_user_profile
+from data_loader import HR_CHUNKSIZE, load_user_data, preprocess_data
+from data_analyzer import merge_daily_data
+
+COHORT_INDEX_FILE = 'cohort_index.json'
+COHORT_INDEX_VERSION = 2
+
+# merged_df column -> label used when citing percentiles
+COHORT_METRICS = {
+    'score': 'readiness score',
+    'score_sleep': 'sleep score',
+    'score_activity': 'activity score',
+    'contributors_hrv_balance': 'HRV balance',
+    'spo2_percentage': 'blood oxygen level',
+    'avg_hr': 'average heart rate',
+    'steps': 'daily steps'
+}
+
+WEIGHT_BAND_LB = 20
+ROLLING_MEDIAN_DAYS = 7
+# Smaller cohorts fall back to the next broader one (gender only, then everyone)
+MIN_COHORT_USERS = 5
+QUANTILES = np.linspace(0, 1, 101)
+
+_indexes = {}
+
+
+def cohort_index_path(archive_path=ARCHIVE_PATH):
+    return os.path.join(archive_path, COHORT_INDEX_FILE)
+
+
+def cohort_keys(profile):
+    """Cohorts a profile belongs to, most specific first"""
+    keys = []
+    if profile['gender']:
+        if profile['height_ft'] and profile['weight_lb']:
+            band = profile['weight_lb'] // WEIGHT_BAND_LB * WEIGHT_BAND_LB
+            keys.append(f"{profile['gender']}|{profile['height_ft']}ft|{band}-{band + WEIGHT_BAND_LB - 1}lb")
+        keys.append(profile['gender'])
+    keys.append('all')
+    return keys
+
+
+def cohort_label(key):
+    """Readable cohort name, e.g. 'male, 6ft, 180-199lb'"""
+    return "all users" if key == 'all' else key.replace('|', ', ')
+
+
+def user_cohort_table(users):
+    """One (user, cohort) row for every cohort each user belongs to"""
+    return pd.DataFrame([(user, key) for user in users for key in cohort_keys(parse_user_profile(user))],
+                        columns=['user', 'cohort'])
+
+
+def stack_daily_frames(user_dirs):
+    """One long-format table (user, day, metric, value) over every user's daily data"""
+    frames = []
+    for user_dir in user_dirs:
+        with contextlib.redirect_stdout(io.StringIO()):
+            merged_df = merge_daily_data(preprocess_data(load_user_data(user_dir, hr_chunksize=HR_CHUNKSIZE)))
+        if merged_df is None or merged_df.empty:
+            continue
+        metrics = [col for col in COHORT_METRICS if col in merged_df.columns]
+        long_df = merged_df[['day', *metrics]].astype({col: 'float64' for col in metrics}).melt(
+            id_vars='day', var_name='metric').dropna(subset=['value'])
+        long_df.insert(0, 'user', os.path.basename(os.path.normpath(user_dir)))
+        frames.append(long_df)
+
+    if not frames:
+        return pd.DataFrame(columns=['user', 'day', 'metric', 'value'])
+    return pd.concat(frames, ignore_index=True).astype({'user': 'category', 'metric': 'category'})
+
+
+def compute_cohort_stats(long_df, user_cohorts):
+    """Per (cohort, metric): percentile grid, user count and median over the cohort's users.
+
+    Each user first counts once, with the median of their last
+    ROLLING_MEDIAN_DAYS recorded values, so long histories do not outweigh
+    short ones. user_cohorts maps users to cohorts as user_cohort_table does.
+    """
+    by_user = long_df.groupby(['user', 'metric'], observed=True)
+    per_user = (long_df[by_user.cumcount(ascending=False) < ROLLING_MEDIAN_DAYS]
+                .groupby(['user', 'metric'], observed=True)['value'].median().reset_index())
+    per_user['user'] = per_user['user'].astype(str)
+    per_user['metric'] = per_user['metric'].astype(str)
+
+    grouped = per_user.merge(user_cohorts, on='user').groupby(['cohort', 'metric'])
+    quantiles = grouped['value'].quantile(QUANTILES).unstack()
+    n_users = grouped['user'].nunique()
+    median = grouped['value'].median()
+
+    index = {}
+    for (cohort, metric), row in quantiles.iterrows():
+        index.setdefault(cohort, {})[metric] = {
+            'quantiles': row.round(4).tolist(),
+            'n_users': int(n_users[(cohort, metric)]),
+            'median': float(median[(cohort, metric)])
+        }
+    return index
+
+
+def build_cohort_index(archive_path=ARCHIVE_PATH, index_path=None):
+    """Recompute cohort statistics over every profile in archive_path and save them"""
+    index_path = index_path or cohort_index_path(archive_path)
+    long_df = stack_daily_frames(discover_user_directories(archive_path))
+    users = sorted(long_df['user'].unique())
+    index = {
+        'version': COHORT_INDEX_VERSION,
+        'built': datetime.now().isoformat(timespec='seconds'),
+        'users': len(users),
+        'cohorts': compute_cohort_stats(long_df, user_cohort_table(users)) if users else {}
+    }
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+
+def load_cohort_index(index_path):
+    """The saved cohort index, memoized until the file changes; None if it does not exist or is outdated"""
+    try:
+        mtime = os.stat(index_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _indexes.get(index_path)
+    if cached is None or cached[0] != mtime:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get('version') != COHORT_INDEX_VERSION:
+            print(f"Warning: Ignoring outdated cohort index {index_path}; rebuild it with cohort.py")
+            index = None
+        cached = _indexes[index_path] = (mtime, index)
+    return cached[1]
+
+
+def cohort_percentile(index, profile, metric, value):
+    """Percentile of value within the most specific large-enough cohort of profile, or None.
+
+    A binary search over the fixed 101-point percentile grid, so constant time
+    regardless of how many users or days the index was built from.
+    """
+    for key in cohort_keys(profile):
+        entry = index['cohorts'].get(key, {}).get(metric)
+        if entry is None or entry['n_users'] < MIN_COHORT_USERS:
+            continue
+        grid = entry['quantiles']
+        # Midpoint of the ties, so a value equal to the cohort median lands on 50
+        rank = (bisect.bisect_left(grid, value) + bisect.bisect_right(grid, value)) / 2
+        return {'metric': metric, 'label': COHORT_METRICS[metric], 'value': round(value, 1),
+                'percentile': round(min(max(rank / len(grid) * 100, 0), 100)),
+                'cohort': key, 'cohort_label': cohort_label(key),
+                'cohort_median': round(entry['median'], 1), 'n_users': entry['n_users']}
+    return None
+
+
+def user_medians(merged_df):
+    """Per metric, the median of the user's last ROLLING_MEDIAN_DAYS recorded values, as the index holds them"""
+    medians = {}
+    for metric in COHORT_METRICS:
+        if metric in merged_df.columns:
+            values = merged_df[metric].dropna().tail(ROLLING_MEDIAN_DAYS)
+            if not values.empty:
+                medians[metric] = float(values.astype('float64').median())
+    return medians
+
+
+def user_percentiles(index, profile, values):
+    """Cohort percentiles for every metric with a value in values (as user_medians returns them)"""
+    percentiles = []
+    for metric in COHORT_METRICS:
+        if metric in values and not is_missing(values[metric]):
+            result = cohort_percentile(index, profile, metric, float(values[metric]))
+            if result is not None:
+                percentiles.append(result)
+    return percentiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute cohort percentiles over every profile in the archive.")
+    parser.add_argument('--archive', default=ARCHIVE_PATH, help="directory containing one folder per user")
+    parser.add_argument('--output', help=f"index file (default: <archive>/{COHORT_INDEX_FILE})")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    index = build_cohort_index(args.archive, args.output)
+    print(f"Cohort index for {index['users']} users and {len(index['cohorts'])} cohorts saved to "
+          f"{args.output or cohort_index_path(args.archive)}")
+
+
+if __name__ == "__main__":
+    main()
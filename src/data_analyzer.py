@@ -1,46 +1,118 @@
 import pandas as pd
 
+from instrumentation import stage
 
-def analyze_data(processed_data):
-    """Analyze data and establish baselines"""
-    base_dfs = [processed_data.get(key) for key in ['readiness', 'sleep', 'activity']]
-    base_df = next((df for df in base_dfs if df is not None), None)
+MERGED_DATASETS = ['readiness', 'sleep', 'activity', 'spo2', 'hr', 'hr_intraday']
 
-    if base_df is None:
-        print("Error: No daily data available for analysis.")
-        return None, None
 
-    merged_df = base_df.copy()
+ACTIVITY_COLUMNS = ['day', 'score', 'steps', 'average_met_minutes', 'total_calories',
+                    'high_activity_time', 'medium_activity_time', 'low_activity_time',
+                    'sedentary_time', 'resting_time', 'non_wear_time']
+
+# (dataset, columns to keep, suffix for clashing columns, join): outer datasets define
+# the calendar of days, left datasets are only attached to days already on it
+DAILY_JOINS = [
+    ('readiness', None, '', 'outer'),
+    ('sleep', None, '_sleep', 'outer'),
+    ('activity', ACTIVITY_COLUMNS, '_activity', 'outer'),
+    ('spo2', None, '_spo2', 'left'),
+    ('hr', None, '_hr', 'left'),
+    ('hr_intraday', None, '_intraday', 'left')
+]
+
+# Downstream, an unsuffixed 'score' always means readiness
+SUFFIX_ALWAYS = {'score'}
+
 
-    if processed_data['sleep'] is not None and merged_df is not base_df:
-        merged_df = pd.merge(merged_df, processed_data['sleep'], on='day', how='outer', suffixes=('', '_sleep'))
+def merge_daily_data(processed_data):
+    """Join the daily datasets on 'day', sorted by day.
 
-    if processed_data['activity'] is not None:
-        activity_cols = ['day', 'score', 'steps', 'average_met_minutes', 'total_calories',
-                         'high_activity_time', 'medium_activity_time', 'low_activity_time',
-                         'sedentary_time', 'resting_time', 'non_wear_time']
-        activity_cols = [col for col in activity_cols if col in processed_data['activity'].columns]
-        merged_df = pd.merge(merged_df, processed_data['activity'][activity_cols],
-                             on='day', how='outer', suffixes=('', '_activity'))
+    Every dataset is indexed by its normalized day and aligned to a single
+    shared calendar (the union of the outer datasets' days) in one concat.
+    Clashing columns get the dataset's suffix as the old chained merges did.
+    """
+    frames = []
+    for key, columns, suffix, how in DAILY_JOINS:
+        df = processed_data.get(key)
+        if df is None:
+            continue
+        if columns:
+            df = df[[col for col in columns if col in df.columns]]
+        df = df.set_index(pd.DatetimeIndex(df['day']).normalize()).drop(columns='day')
+        if not df.index.is_unique:
+            df = df[~df.index.duplicated(keep='last')]
+        frames.append((df, suffix, how))
 
-    for key in ['spo2', 'hr']:
-        if processed_data[key] is not None:
-            merged_df = pd.merge(merged_df, processed_data[key], on='day', how='left')
+    outer = [df for df, _, how in frames if how == 'outer']
+    if not outer:
+        return None
 
-    merged_df = merged_df.sort_values('day')
+    calendar = outer[0].index
+    for df in outer[1:]:
+        calendar = calendar.union(df.index)
+    calendar = calendar.sort_values()
 
+    aligned = []
+    seen = set()
+    for df, suffix, _ in frames:
+        if suffix:
+            df = df.rename(columns={col: f'{col}{suffix}' for col in df.columns
+                                    if col in seen or col in SUFFIX_ALWAYS})
+        seen.update(df.columns)
+        aligned.append(df.reindex(calendar))
+
+    merged_df = pd.concat(aligned, axis=1)
+    merged_df.index.name = 'day'
+    return merged_df.reset_index()
+
+
+def add_rolling_features(merged_df):
+    """Add the 7d/14d rolling averages and trend columns"""
     for col, avg_col in [('score', 'readiness'), ('score_sleep', 'sleep'), ('score_activity', 'activity')]:
         if col in merged_df.columns:
             merged_df[f'{avg_col}_7d_avg'] = merged_df[col].rolling(7, min_periods=1).mean()
             merged_df[f'{avg_col}_14d_avg'] = merged_df[col].rolling(14, min_periods=7).mean()
             merged_df[f'{avg_col}_trend'] = (merged_df[col] / merged_df[f'{avg_col}_7d_avg'] - 1) * 100
 
-    for col, avg_col in [('contributors_hrv_balance', 'hrv'), ('contributors_resting_heart_rate', 'rhr')]:
+    for col, avg_col in [('contributors_hrv_balance', 'hrv'), ('contributors_resting_heart_rate', 'rhr'),
+                         ('night_resting_hr', 'night_rhr')]:
         if col in merged_df.columns:
             merged_df[f'{avg_col}_7d_avg'] = merged_df[col].rolling(7, min_periods=1).mean()
             merged_df[f'{avg_col}_trend'] = (merged_df[col] / merged_df[f'{avg_col}_7d_avg'] - 1) * 100
 
+    return merged_df
+
+
+def analyze_data(processed_data, start=None, end=None):
+    """Analyze data and establish baselines.
+
+    start and end (inclusive dates) restrict the result to a window of days;
+    rolling features are computed over the full history first, so the first
+    days of a window keep their lookback.
+    """
+    with stage('analyze.merge') as record:
+        merged_df = merge_daily_data(processed_data)
+        record['rows'] = None if merged_df is None else len(merged_df)
+    if merged_df is None or merged_df.empty:
+        print("Error: No daily data available for analysis.")
+        return None, None
+    with stage('analyze.rolling', rows=len(merged_df)):
+        merged_df = add_rolling_features(merged_df)
+
+    return select_window(merged_df, start, end)
+
+
+def select_window(merged_df, start=None, end=None):
+    """The analyzed days from start to end (inclusive dates) and the last week of them"""
+    if start is not None or end is not None:
+        in_window = merged_df['day'].between(pd.Timestamp(start) if start else merged_df['day'].min(),
+                                             pd.Timestamp(end) if end else merged_df['day'].max())
+        merged_df = merged_df[in_window].reset_index(drop=True)
+    if merged_df.empty:
+        print("Error: No daily data available for analysis.")
+        return None, None
+
     last_date = merged_df['day'].max()
     recent_df = merged_df[merged_df['day'] >= last_date - pd.Timedelta(days=7)]
 
-    return merged_df, recent_df
\ No newline at end of file
+    return merged_df, recent_df
@@ -1,79 +1,374 @@
+import json
+import os
+import re
+
 import pandas as pd
-from utils import find_latest_file
-import pandas as pd
 
-from utils import find_latest_file
+from instrumentation import stage
+from intraday import compute_intraday_features, intraday_features_from_chunks
+from utils import TIMESTAMP_PATTERN, extract_file_timestamp, index_directory
+
+FILE_PATTERNS = {
+    'readiness': r'oura_daily-readiness_.*\.csv$',
+    'sleep': r'oura_daily-sleep_.*\.csv$',
+    'hr': r'oura_heart-rate_.*\.csv$',
+    'spo2': r'oura_daily-spo2_.*\.csv$',
+    'bedtime': r'oura_bedtime_.*\.csv$',
+    'activity': r'oura_daily-activity_.*\.csv$',
+    'sleep_full': r'oura_sleep_.*\.csv$'
+}
+FILE_REGEXES = {key: re.compile(pattern) for key, pattern in FILE_PATTERNS.items()}
+
+# Columns parsed to datetimes at load time, so the cached copies are already typed
+DATE_COLUMNS = {
+    'readiness': ['day'],
+    'sleep': ['day'],
+    'hr': ['timestamp'],
+    'spo2': ['day'],
+    'bedtime': ['date'],
+    'activity': ['day'],
+    'sleep_full': ['day']
+}
+
+# Columns (and their dtypes) read from each export, covering everything analyze_data,
+# generate_recommendations and generate_health_report consume. Date columns are typed
+# separately through DATE_COLUMNS. Datasets missing here are loaded only when accessed.
+REQUIRED_COLUMNS = {
+    'readiness': {
+        'day': None, 'score': 'Int64', 'contributors_hrv_balance': 'Int64',
+        'contributors_recovery_index': 'Int64', 'contributors_resting_heart_rate': 'Int64',
+        'contributors_body_temperature': 'Int64'
+    },
+    'sleep': {
+        'day': None, 'score': 'Int64', 'contributors_deep_sleep': 'Int64', 'contributors_rem_sleep': 'Int64',
+        'contributors_efficiency': 'Int64', 'contributors_latency': 'Int64', 'contributors_timing': 'Int64'
+    },
+    'activity': {
+        'day': None, 'score': 'Int64', 'steps': 'Int64', 'average_met_minutes': 'float64',
+        'total_calories': 'Int64', 'high_activity_time': 'Int64', 'medium_activity_time': 'Int64',
+        'low_activity_time': 'Int64', 'sedentary_time': 'Int64', 'resting_time': 'Int64',
+        'non_wear_time': 'Int64'
+    },
+    'spo2': {'day': None, 'spo2_percentage': 'float64'},
+    'hr': {'timestamp': None, 'bpm': 'float32'}
+}
+
+# Rows per chunk when streaming the minute-level heart-rate export
+HR_CHUNKSIZE = 500_000
+
+CACHE_DIR = '.cache'
+CACHE_VERSION = 4
+
+
+class LazyDatasets(dict):
+    """dict whose deferred entries are built by their loader on first access.
+
+    Deferred keys count for `in` and get(), but are absent from keys()/items()
+    until they have been loaded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaders = {}
+
+    def defer(self, key, loader):
+        self._loaders[key] = loader
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._loaders
+
+    def __missing__(self, key):
+        if key not in self._loaders:
+            raise KeyError(key)
+        value = self[key] = self._loaders.pop(key)()
+        return value
 
+    def get(self, key, default=None):
+        return self[key] if key in self else default
 
-def load_user_data(user_dir):
-    """Load all data files for the selected user"""
-    file_patterns = {
-        'readiness': r'oura_daily-readiness_.*\.csv$',
-        'sleep': r'oura_daily-sleep_.*\.csv$',
-        'hr': r'oura_heart-rate_.*\.csv$',
-        'spo2': r'oura_daily-spo2_.*\.csv$',
-        'bedtime': r'oura_bedtime_.*\.csv$',
-        'activity': r'oura_daily-activity_.*\.csv$',
-        'sleep_full': r'oura_sleep_.*\.csv$'
+
+def _cache_key(path, columns=None):
+    """Identify a source file by path, size, mtime and export timestamp, plus the projected columns"""
+    stat = os.stat(path)
+    return {
+        'version': CACHE_VERSION,
+        'columns': columns,
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'timestamp': extract_file_timestamp(os.path.basename(path))
     }
 
+
+def load_cached_frame(path, build, name=None, columns=None):
+    """Return build(path), reusing a Parquet copy in the user's cache directory while the source is unchanged"""
+    cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR)
+    base = os.path.join(cache_dir, name or os.path.basename(path))
+    meta_path, data_path = base + '.json', base + '.parquet'
+    key = _cache_key(path, columns)
+
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            if json.load(f) == key:
+                return pd.read_parquet(data_path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable cache for {path}: {e}")
+
+    df = build(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(data_path, index=False)
+        # The key is written last so an interrupted write never validates a partial Parquet file
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(key, f)
+        _prune_superseded(cache_dir, os.path.basename(base))
+    except ImportError:
+        pass  # No Parquet engine installed: caching is simply disabled
+    except Exception as e:
+        print(f"Warning: Could not cache {path}: {e}")
+    return df
+
+
+def _prune_superseded(cache_dir, entry):
+    """Remove cached copies of other exports of the same dataset as entry, which a newer export has replaced"""
+    dataset = TIMESTAMP_PATTERN.sub('', entry)
+    if dataset == entry:
+        return  # No export timestamp to tell versions of the dataset apart
+    for filename in os.listdir(cache_dir):
+        stem, ext = os.path.splitext(filename)
+        if (ext in ('.json', '.parquet') and stem != entry and TIMESTAMP_PATTERN.search(stem)
+                and TIMESTAMP_PATTERN.sub('', stem) == dataset):
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except OSError as e:
+                print(f"Warning: Could not remove stale cache entry {filename}: {e}")
+
+
+def _csv_projection(key):
+    """usecols/dtype arguments for read_csv that read only the columns in REQUIRED_COLUMNS"""
+    columns = REQUIRED_COLUMNS.get(key)
+    if columns is None:
+        return {}
+    # A callable tolerates columns that an older export does not have
+    return {'usecols': lambda col: col in columns,
+            'dtype': {col: dtype for col, dtype in columns.items() if dtype is not None}}
+
+
+def read_export(path, key):
+    """Read one Oura CSV export, projected to its required columns, with date columns converted"""
+    projection = _csv_projection(key)
+    try:
+        df = pd.read_csv(path, **projection)
+    except (ValueError, TypeError):
+        # Values that do not fit the declared dtypes: keep the projection, let pandas infer types
+        df = pd.read_csv(path, usecols=projection.get('usecols'))
+    for col in DATE_COLUMNS.get(key, []):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+
+def _hr_day(timestamps):
+    """Calendar day of each sample on its local wall clock, as .dt.date would give"""
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.dt.normalize()
+
+
+def _read_heart_rate_chunks(path, chunksize):
+    """The heart-rate export's timestamp and bpm columns, chunksize rows at a time, timestamps parsed"""
+    for chunk in pd.read_csv(path, usecols=['timestamp', 'bpm'], dtype={'bpm': 'float32'}, chunksize=chunksize):
+        chunk['timestamp'] = _to_datetime(chunk['timestamp'])
+        yield chunk
+
+
+def _accumulate_heart_rate(totals, chunk):
+    """Fold one chunk into the per-day count, sum, sum of squares, min and max"""
+    chunk = chunk.dropna(subset=['bpm'])
+    bpm = chunk['bpm'].astype('float64')
+    stats = pd.DataFrame({'bpm': bpm, 'sq': bpm ** 2}).groupby(_hr_day(chunk['timestamp']).values).agg(
+        count=('bpm', 'count'), sum=('bpm', 'sum'), sumsq=('sq', 'sum'), min=('bpm', 'min'), max=('bpm', 'max'))
+    if totals is None:
+        return stats
+    return pd.concat([totals, stats]).groupby(level=0).agg(
+        {'count': 'sum', 'sum': 'sum', 'sumsq': 'sum', 'min': 'min', 'max': 'max'})
+
+
+def _daily_heart_rate(totals):
+    """The daily avg/min/max/std frame from accumulated per-day totals"""
+    if totals is None or totals.empty:
+        return pd.DataFrame(columns=['day', 'avg_hr', 'min_hr', 'max_hr', 'hr_variability'])
+
+    count = totals['count']
+    avg_hr = totals['sum'] / count
+    variance = ((totals['sumsq'] - totals['sum'] * avg_hr) / (count - 1)).clip(lower=0)
+    return pd.DataFrame({
+        'day': pd.to_datetime(totals.index),
+        'avg_hr': avg_hr.values,
+        'min_hr': totals['min'].values,
+        'max_hr': totals['max'].values,
+        'hr_variability': variance.where(count > 1).pow(0.5).values
+    })
+
+
+def aggregate_heart_rate(path, chunksize=HR_CHUNKSIZE):
+    """Stream the heart-rate export in chunks into the daily avg/min/max/std frame.
+
+    Only per-day accumulators (count, sum, sum of squares, min, max) are kept
+    between chunks, so memory is bounded by the number of days rather than
+    the number of samples. bpm is read as float, so min_hr/max_hr are float64
+    even for an export without missing samples, where a plain groupby kept int64.
+    """
+    totals = None
+    for chunk in _read_heart_rate_chunks(path, chunksize):
+        totals = _accumulate_heart_rate(totals, chunk)
+    return _daily_heart_rate(totals)
+
+
+def stream_heart_rate(path, chunksize=HR_CHUNKSIZE):
+    """(aggregate_heart_rate, intraday features) of the heart-rate export from a single chunked read"""
+    totals = None
+
+    def accumulate(chunks):
+        nonlocal totals
+        for chunk in chunks:
+            totals = _accumulate_heart_rate(totals, chunk)
+            yield chunk
+
+    intraday = intraday_features_from_chunks(accumulate(_read_heart_rate_chunks(path, chunksize)))
+    return _daily_heart_rate(totals), intraday
+
+
+def load_user_data(user_dir, hr_chunksize=None):
+    """Load all data files for the selected user.
+
+    Only the columns in REQUIRED_COLUMNS are read; datasets without an entry
+    there are deferred until first accessed. With hr_chunksize set, the
+    heart-rate export is streamed straight into daily aggregates
+    (data['hr_daily']) and intraday features (data['hr_intraday']) instead of
+    loading the minute series.
+    """
+    latest_files = index_directory(user_dir, FILE_REGEXES)
     file_paths = {}
-    for key, pattern in file_patterns.items():
-        file_path = find_latest_file(user_dir, pattern)
-        if file_path:
-            file_paths[key] = file_path
+    for key in FILE_PATTERNS:
+        if key in latest_files:
+            file_paths[key] = latest_files[key]
         else:
             print(f"Warning: No {key} file found for this user.")
 
-    data = {}
+    data = LazyDatasets()
     for key, path in file_paths.items():
-        try:
-            data[key] = pd.read_csv(path)
-            print(f"Loaded {key} data: {path}")
-        except Exception as e:
-            print(f"Error loading {key} data: {e}")
-            data[key] = None
+        if key not in REQUIRED_COLUMNS:
+            data.defer(key, lambda k=key, p=path: _load_export(k, p))
+            continue
+        if key == 'hr' and hr_chunksize:
+            # Both frames come out of one read of the export; whichever cache misses first runs it
+            streamed = {}
+
+            def build(p, name):
+                if not streamed:
+                    streamed.update(zip(['hr_daily', 'hr_intraday'], stream_heart_rate(p, hr_chunksize)))
+                return streamed[name]
+
+            for name in ['hr_daily', 'hr_intraday']:
+                try:
+                    with stage(f'load.{name}', path=path) as record:
+                        data[name] = load_cached_frame(path, lambda p, n=name: build(p, n),
+                                                       name=f"{os.path.basename(path)}.{name}")
+                        record['rows'] = len(data[name])
+                    print(f"Aggregated {name} data: {path}")
+                except Exception as e:
+                    print(f"Error aggregating {name} data: {e}")
+                    data[name] = None
+            continue
+        data[key] = _load_export(key, path)
 
     return data
 
+
+def _load_export(key, path):
+    """Load one dataset through the cache, or None if it cannot be read"""
+    try:
+        columns = REQUIRED_COLUMNS.get(key)
+        with stage(f'load.{key}', path=path) as record:
+            df = load_cached_frame(path, lambda p: read_export(p, key), columns=sorted(columns) if columns else None)
+            record['rows'] = len(df)
+        print(f"Loaded {key} data: {path}")
+        return df
+    except Exception as e:
+        print(f"Error loading {key} data: {e}")
+        return None
+
+
+def _to_datetime(series):
+    """Convert to datetimes unless the column already came typed from the cache"""
+    return series if pd.api.types.is_datetime64_any_dtype(series) else pd.to_datetime(series)
+
+
+def _preprocess_daily(df, date_col='day'):
+    df = df.copy()
+    df[date_col] = _to_datetime(df[date_col])
+    return df
+
+
+def _preprocess_sleep_full(df):
+    df = df.copy()
+    if 'day' in df.columns:
+        df['day'] = _to_datetime(df['day'])
+    return df
+
+
 def preprocess_data(data):
-    """Preprocess all data files"""
-    processed = {}
+    """Preprocess all data files.
+
+    bedtime and sleep_full are preprocessed lazily, so they are only read if
+    something downstream asks for them.
+    """
+    processed = LazyDatasets()
 
-    for key in ['readiness', 'sleep', 'activity', 'bedtime']:
+    for key in ['readiness', 'sleep', 'activity']:
         if key in data and data[key] is not None:
-            df = data[key].copy()
-            date_col = 'day' if key != 'bedtime' else 'date'
-            df[date_col] = pd.to_datetime(df[date_col])
-            processed[key] = df
+            with stage(f'preprocess.{key}', rows=len(data[key])):
+                processed[key] = _preprocess_daily(data[key])
         else:
             processed[key] = None
 
     if 'spo2' in data and data['spo2'] is not None:
-        spo2_df = data['spo2'].copy()
-        spo2_df['day'] = pd.to_datetime(spo2_df['day'])
-        spo2_df = spo2_df.dropna(subset=['spo2_percentage'])
-        processed['spo2'] = spo2_df.groupby('day')['spo2_percentage'].mean().reset_index() if not spo2_df.empty else None
+        with stage('preprocess.spo2', rows=len(data['spo2'])):
+            spo2_df = data['spo2'].copy()
+            spo2_df['day'] = _to_datetime(spo2_df['day'])
+            spo2_df = spo2_df.dropna(subset=['spo2_percentage'])
+            processed['spo2'] = spo2_df.groupby('day')['spo2_percentage'].mean().reset_index() if not spo2_df.empty else None
     else:
         processed['spo2'] = None
 
-    if 'hr' in data and data['hr'] is not None:
-        hr_df = data['hr'].copy()
-        hr_df['timestamp'] = pd.to_datetime(hr_df['timestamp'])
-        hr_df['day'] = hr_df['timestamp'].dt.date
-        hr_daily = hr_df.groupby('day').agg({'bpm': ['mean', 'min', 'max', 'std']}).reset_index()
-        hr_daily.columns = ['day', 'avg_hr', 'min_hr', 'max_hr', 'hr_variability']
-        hr_daily['day'] = pd.to_datetime(hr_daily['day'])
-        processed['hr'] = hr_daily
+    if data.get('hr_daily') is not None:
+        processed['hr'] = data['hr_daily']
+    elif 'hr' in data and data['hr'] is not None:
+        with stage('preprocess.hr', rows=len(data['hr'])):
+            hr_df = data['hr'].copy()
+            hr_df['timestamp'] = _to_datetime(hr_df['timestamp'])
+            hr_df['day'] = hr_df['timestamp'].dt.date
+            hr_daily = hr_df.groupby('day').agg({'bpm': ['mean', 'min', 'max', 'std']}).reset_index()
+            hr_daily.columns = ['day', 'avg_hr', 'min_hr', 'max_hr', 'hr_variability']
+            hr_daily['day'] = pd.to_datetime(hr_daily['day'])
+            processed['hr'] = hr_daily
     else:
         processed['hr'] = None
 
-    if 'sleep_full' in data and data['sleep_full'] is not None:
-        sleep_full_df = data['sleep_full'].copy()
-        if 'day' in sleep_full_df.columns:
-            sleep_full_df['day'] = pd.to_datetime(sleep_full_df['day'])
-        processed['sleep_full'] = sleep_full_df
+    if data.get('hr_intraday') is not None:
+        processed['hr_intraday'] = data['hr_intraday']
+    elif 'hr' in data and data['hr'] is not None:
+        with stage('preprocess.hr_intraday', rows=len(data['hr'])):
+            processed['hr_intraday'] = compute_intraday_features(data['hr'])
     else:
-        processed['sleep_full'] = None
+        processed['hr_intraday'] = None
+
+    processed.defer('bedtime', lambda: _preprocess_daily(data['bedtime'], 'date')
+                    if data.get('bedtime') is not None else None)
+    processed.defer('sleep_full', lambda: _preprocess_sleep_full(data['sleep_full'])
+                    if data.get('sleep_full') is not None else None)
 
-    return processed
\ No newline at end of file
+    return processed
@@ -0,0 +1,101 @@
+import contextlib
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+
+# Set to a file path to record a JSON stage trace / a cProfile dump for the run
+TRACE_ENV = 'NAPLETT_TRACE'
+PROFILE_ENV = 'NAPLETT_PROFILE'
+
+_trace = None
+
+
+class _Trace:
+    """Stage records for one run, plus the tracemalloc/cProfile state backing them"""
+
+    def __init__(self, trace_path, profile_path):
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.records = []
+        self.stack = []
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile() if profile_path else None
+
+    def enter(self, record):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            # reset_peak() below would otherwise lose the enclosing stage's peak so far
+            self.stack[-1]['_peak'] = max(self.stack[-1]['_peak'], peak)
+        tracemalloc.reset_peak()
+        record.update(depth=len(self.stack), _start_memory=current, _peak=current,
+                      _wall=time.perf_counter(), _cpu=time.process_time())
+        self.records.append(record)
+        self.stack.append(record)
+
+    def exit(self, record):
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, record.pop('_peak'))
+        record['wall_s'] = time.perf_counter() - record.pop('_wall')
+        record['cpu_s'] = time.process_time() - record.pop('_cpu')
+        record['peak_memory_bytes'] = peak - record.pop('_start_memory')
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1]['_peak'] = max(self.stack[-1]['_peak'], peak)
+
+
+def start_trace(trace_path=None, profile_path=None):
+    """Start recording stages; paths default to the NAPLETT_TRACE/NAPLETT_PROFILE environment variables.
+
+    Returns True if tracing was enabled.
+    """
+    global _trace
+    trace_path = trace_path or os.environ.get(TRACE_ENV)
+    profile_path = profile_path or os.environ.get(PROFILE_ENV)
+    if not trace_path and not profile_path:
+        return False
+
+    tracemalloc.start()
+    _trace = _Trace(trace_path, profile_path)
+    if _trace.profiler:
+        _trace.profiler.enable()
+    return True
+
+
+def stop_trace():
+    """Stop recording and write the JSON trace and cProfile dump, if enabled"""
+    global _trace
+    if _trace is None:
+        return
+    trace, _trace = _trace, None
+    if trace.profiler:
+        trace.profiler.disable()
+        trace.profiler.dump_stats(trace.profile_path)
+        print(f"Profile saved to {trace.profile_path}")
+    tracemalloc.stop()
+
+    if trace.trace_path:
+        with open(trace.trace_path, "w", encoding="utf-8") as f:
+            json.dump({'total_wall_s': time.perf_counter() - trace.started, 'stages': trace.records},
+                      f, indent=2, default=str)
+        print(f"Stage trace saved to {trace.trace_path}")
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """Time a pipeline stage: wall time, CPU time and peak traced memory.
+
+    Yields the stage record so callers can attach row counts or other fields;
+    when tracing is off the record is simply discarded.
+    """
+    record = {'stage': name, **fields}
+    if _trace is None:
+        yield record
+        return
+
+    _trace.enter(record)
+    try:
+        yield record
+    finally:
+        _trace.exit(record)
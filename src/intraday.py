@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+# Samples 00:00-06:00 local time count as night
+NIGHT_END_HOUR = 6
+
+# Length of the window averaged before taking resting minima, whatever the sampling cadence
+RESTING_WINDOW_MINUTES = 30
+
+# Lower bpm bounds of each heart-rate zone after 'rest'
+ZONE_EDGES = [60, 100, 140]
+ZONE_NAMES = ['rest', 'light', 'moderate', 'vigorous']
+
+# How long after the day's peak the recovery slope is measured, and how much later than
+# that the first follow-up sample may come before the slope is left missing
+RECOVERY_MINUTES = 10
+RECOVERY_TOLERANCE_MINUTES = 5
+
+INTRADAY_COLUMNS = (['day', 'night_resting_hr', 'day_resting_hr']
+                    + [f'hr_zone_{name}_pct' for name in ZONE_NAMES]
+                    + ['hr_recovery_slope'])
+
+_NS_PER_MINUTE = 60 * 10**9
+_NS_PER_DAY = 24 * 60 * _NS_PER_MINUTE
+
+
+def _segment_starts(segments):
+    """Start index of each run of equal values in a sorted segment array"""
+    return np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+
+
+def _segment_reduce(ufunc, values, segments, n_segments):
+    """ufunc-reduce values per segment id (sorted); segments with no values are NaN"""
+    out = np.full(n_segments, np.nan)
+    if len(values):
+        starts = _segment_starts(segments)
+        out[segments[starts]] = ufunc.reduceat(values, starts)
+    return out
+
+
+def _window_minima(ts, bpm, groups, group_ends, n_groups, window_ns):
+    """Per group, the minimum mean bpm over the samples in [t, t + window_ns) for every sample time t.
+
+    Only windows that end by their group's end time (group_ends, per sample)
+    count, so every window lies in a single group.
+    """
+    sums = np.concatenate([[0.0], np.cumsum(bpm)])
+    starts = np.arange(len(ts))
+    stops = np.searchsorted(ts, ts + window_ns, side='left')
+    means = (sums[stops] - sums[starts]) / (stops - starts)
+    fits = ts + window_ns <= group_ends
+    return _segment_reduce(np.minimum, means[fits], groups[fits], n_groups)
+
+
+def compute_intraday_features(hr_df):
+    """Vectorized daily features from a heart-rate frame with 'timestamp' and 'bpm' columns.
+
+    Returns one row per local calendar day with resting heart rate at night
+    and during the day (lowest rolling mean), the share of samples in each
+    heart-rate zone, and the recovery slope (bpm/min) after the day's peak.
+    """
+    hr_df = hr_df.dropna(subset=['bpm'])
+    if hr_df.empty:
+        return pd.DataFrame(columns=INTRADAY_COLUMNS)
+
+    timestamps = pd.to_datetime(hr_df['timestamp'])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    ts = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    bpm = hr_df['bpm'].to_numpy(dtype='float64')
+    order = np.argsort(ts, kind='stable')
+    ts, bpm = ts[order], bpm[order]
+
+    day_ns = ts - ts % _NS_PER_DAY
+    days, segments = np.unique(day_ns, return_inverse=True)
+    n_days = len(days)
+    counts = np.bincount(segments, minlength=n_days)
+
+    # Night samples precede day samples within each day, so (day, period) ids stay sorted
+    night_end_ns = NIGHT_END_HOUR * 60 * _NS_PER_MINUTE
+    is_daytime = (ts - day_ns) >= night_end_ns
+    periods = segments * 2 + is_daytime
+    period_ends = day_ns + np.where(is_daytime, _NS_PER_DAY, night_end_ns)
+    resting = _window_minima(ts, bpm, periods, period_ends, n_days * 2,
+                             RESTING_WINDOW_MINUTES * _NS_PER_MINUTE).reshape(n_days, 2)
+
+    zones = np.searchsorted(ZONE_EDGES, bpm, side='right')
+    zone_counts = np.bincount(segments * len(ZONE_NAMES) + zones,
+                              minlength=n_days * len(ZONE_NAMES)).reshape(n_days, len(ZONE_NAMES))
+    zone_pct = zone_counts / counts[:, None] * 100
+
+    peaks = _segment_reduce(np.maximum, bpm, segments, n_days)
+    positions = np.arange(len(bpm))
+    peak_idx = _segment_reduce(np.minimum, np.where(bpm == peaks[segments], positions, len(bpm)),
+                               segments, n_days).astype(np.int64)
+    after_idx = np.minimum(np.searchsorted(ts, ts[peak_idx] + RECOVERY_MINUTES * _NS_PER_MINUTE), len(ts) - 1)
+    elapsed_minutes = (ts[after_idx] - ts[peak_idx]) / _NS_PER_MINUTE
+    # A follow-up sample long after the horizon would measure a different, flatter recovery
+    valid = ((segments[after_idx] == np.arange(n_days)) & (after_idx > peak_idx)
+             & (elapsed_minutes >= RECOVERY_MINUTES)
+             & (elapsed_minutes <= RECOVERY_MINUTES + RECOVERY_TOLERANCE_MINUTES))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(valid, (bpm[after_idx] - peaks) / elapsed_minutes, np.nan)
+
+    features = pd.DataFrame({'day': pd.to_datetime(days), 'night_resting_hr': resting[:, 0],
+                             'day_resting_hr': resting[:, 1]})
+    for i, name in enumerate(ZONE_NAMES):
+        features[f'hr_zone_{name}_pct'] = zone_pct[:, i]
+    features['hr_recovery_slope'] = slope
+    return features
+
+
+def complete_days(chunks):
+    """Regroup timestamp-ordered heart-rate chunks so each yielded frame holds only whole days.
+
+    Samples of the last (possibly incomplete) day of each chunk are carried
+    into the next one, so memory is bounded by one chunk plus one day.
+    Timestamps must already be parsed.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        timestamps = chunk['timestamp'].dt.tz_localize(None) if chunk['timestamp'].dt.tz is not None else chunk['timestamp']
+        day = timestamps.dt.normalize()
+        complete = (day < day.max()).to_numpy()
+        carry = chunk[~complete]
+        if complete.any():
+            yield chunk[complete]
+    if carry is not None and not carry.empty:
+        yield carry
+
+
+def intraday_features_from_chunks(chunks):
+    """compute_intraday_features over a heart-rate export read in chunks.
+
+    Assumes the export is in timestamp order, as Oura writes it.
+    """
+    results = [compute_intraday_features(days) for days in complete_days(chunks)]
+    if not results:
+        return pd.DataFrame(columns=INTRADAY_COLUMNS)
+    return pd.concat(results, ignore_index=True)
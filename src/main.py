@@ -1,34 +1,127 @@
+import argparse
+import os
+import sys
+import time
 import warnings
-from src.utils import list_user_directories, save_report
-from src.data_loader import load_user_data, preprocess_data
-from src.data_analyzer import analyze_data
-from src.recommendation_engine import generate_recommendations
-from src.report_generator import generate_health_report
+from datetime import date
+from utils import ARCHIVE_PATH, discover_user_directories, list_user_directories, save_report
+
+# Output format -> file extension; mirrors report_generator.RENDERERS, which is only imported when a report is built
+FORMATS = {'text': 'txt', 'json': 'json', 'html': 'html', 'markdown': 'md'}
+REPORTS_PATH = os.path.join("..", "reports")
 
 warnings.filterwarnings('ignore')
 
 
-def main():
-    print("\n" + "=" * 80)
-    print("HEALTH MONITORING SYSTEM")
-    print("=" * 80)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a personalized health report from Oura exports.")
+    parser.add_argument('user', nargs='?',
+                        help="user profile directory name, or its number in --list (prompted for if omitted)")
+    parser.add_argument('--archive', default=ARCHIVE_PATH, help="directory containing one folder per user")
+    parser.add_argument('--list', action='store_true', help="list the available user profiles and exit")
+    parser.add_argument('--format', choices=list(FORMATS), default='text', help="report output format")
+    parser.add_argument('--start', help="first day to analyze (YYYY-MM-DD)")
+    parser.add_argument('--end', help="last day to analyze and report on (YYYY-MM-DD)")
+    parser.add_argument('--reports', default=REPORTS_PATH, help="directory to save reports into")
+    parser.add_argument('--no-save', action='store_true', help="print the report without saving it")
+    parser.add_argument('--quiet', action='store_true', help="do not print the report")
+    parser.add_argument('--batch', action='store_true', help="report on every user profile in the archive")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes for --batch")
+    parser.add_argument('--non-interactive', action='store_true',
+                        help="fail instead of prompting when no user is given")
+    parser.add_argument('--trace', help="write a JSON stage trace of the run to this file")
+    args = parser.parse_args(argv)
 
-    user_dir = list_user_directories()
-    data = load_user_data(user_dir)
-    processed_data = preprocess_data(data)
-    merged_df, recent_df = analyze_data(processed_data)
+    for name in ['start', 'end']:
+        value = getattr(args, name)
+        if value and not _is_date(value):
+            parser.error(f"--{name} must be a date in YYYY-MM-DD format, got {value!r}")
+    if args.start and args.end and args.start > args.end:
+        parser.error("--start must not be after --end")
+    if args.batch and (args.start or args.end):
+        parser.error("--start/--end cannot be combined with --batch")
+    return args
+
+
+def _is_date(value):
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def resolve_user(archive_path, user):
+    """Path of the user directory named user, or numbered user in the listing; None if there is none"""
+    user_dirs = discover_user_directories(archive_path)
+    names = [os.path.basename(d) for d in user_dirs]
+    if user in names:
+        return user_dirs[names.index(user)]
+    if user.isdigit() and 1 <= int(user) <= len(user_dirs):
+        return user_dirs[int(user) - 1]
+    return None
+
+
+def run_all_users(args):
+    """--batch: reports for every user profile, through the same process pool as batch.py"""
+    from batch import print_summary, run_batch
+
+    start = time.perf_counter()
+    results = run_batch(args.archive, args.reports, args.workers, args.format)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all(r['status'] != 'error' for r in results) else 1
 
-    if merged_df is None or recent_df is None or recent_df.empty:
-        print("Error: Insufficient data for analysis.")
-        return
 
-    recommendations, alerts, insights = generate_recommendations(merged_df, recent_df, processed_data)
-    report = generate_health_report(merged_df, recent_df, recommendations, alerts, insights)
+def main(argv=None):
+    args = parse_args(argv)
+
+    if not os.path.isdir(args.archive):
+        print(f"Error: {args.archive} directory not found.")
+        return 1
+
+    if args.list:
+        for i, user_dir in enumerate(discover_user_directories(args.archive), 1):
+            print(f"{i}. {os.path.basename(user_dir)}")
+        return 0
+
+    if args.batch:
+        return run_all_users(args)
+
+    if args.user:
+        user_dir = resolve_user(args.archive, args.user)
+        if user_dir is None:
+            print(f"Error: No user profile {args.user} in {args.archive}.")
+            return 1
+    elif args.non_interactive:
+        print("Error: No user profile given; pass one or use --list to see them.")
+        return 1
+    else:
+        print("\n" + "=" * 80)
+        print("HEALTH MONITORING SYSTEM")
+        print("=" * 80)
+        user_dir = list_user_directories(args.archive)
+
+    # Deferred so --help, --list and argument errors never pay for importing pandas
+    from pipeline import run_pipeline
+    from instrumentation import start_trace, stop_trace
+
+    start_trace(args.trace)
+    try:
+        report = run_pipeline(user_dir, args.format, start=args.start, end=args.end)
+    finally:
+        stop_trace()
+
+    if report is None:
+        print("Error: Insufficient data for analysis.")
+        return 1
 
-    print("\n" + report)
-    filename = save_report(report)
-    print(f"\nHealth report saved to {filename}")
+    if not args.quiet:
+        print("\n" + report)
+    if not args.no_save:
+        filename = save_report(report, args.reports, FORMATS[args.format])
+        print(f"\nHealth report saved to {filename}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import os
+
+from data_loader import HR_CHUNKSIZE, load_user_data, preprocess_data
+from data_analyzer import analyze_data, select_window
+from anomaly import anomaly_alerts, anomaly_state_path, detect_anomalies
+from cohort import cohort_index_path, load_cohort_index, user_medians, user_percentiles
+from utils import parse_user_profile
+from recommendation_engine import generate_recommendations
+from report_generator import build_health_report, render_report
+from instrumentation import stage
+
+
+def analyze_user(user_dir, start=None, end=None):
+    """Load, preprocess and analyze one user; returns (processed_data, merged_df, recent_df, anomalies).
+
+    start and end restrict the analysis to a window of days. Anomalies on its
+    last day are then detected from a fresh scan of the history up to end,
+    bypassing the persisted anomaly state.
+    """
+    windowed = start is not None or end is not None
+    with stage('load'):
+        data = load_user_data(user_dir, hr_chunksize=HR_CHUNKSIZE)
+    with stage('preprocess'):
+        processed_data = preprocess_data(data)
+    with stage('analyze'):
+        merged_df, recent_df = analyze_data(processed_data, end=end)
+    anomalies = []
+    if merged_df is not None:
+        with stage('anomalies'):
+            anomalies = detect_anomalies(merged_df, state_path=None if windowed else anomaly_state_path(user_dir))
+        if start is not None:
+            merged_df, recent_df = select_window(merged_df, start)
+    return processed_data, merged_df, recent_df, anomalies
+
+
+def peer_percentiles(user_dir, merged_df):
+    """Cohort percentiles of the user's recent medians, from the index next to the user's directory; [] without one"""
+    user_dir = os.path.normpath(user_dir)
+    index = load_cohort_index(cohort_index_path(os.path.dirname(user_dir)))
+    if index is None:
+        return []
+    return user_percentiles(index, parse_user_profile(os.path.basename(user_dir)), user_medians(merged_df))
+
+
+def build_report(processed_data, merged_df, recent_df, anomalies=None, user_dir=None):
+    """Generate recommendations and the structured HealthReport from analyzed data, or None if there is too little"""
+    if merged_df is None or recent_df is None or recent_df.empty:
+        return None
+
+    with stage('recommend', rows=len(recent_df)):
+        peers = peer_percentiles(user_dir, merged_df) if user_dir else []
+        recommendations, alerts, insights = generate_recommendations(merged_df, recent_df, processed_data, peers)
+        alerts.extend(anomaly_alerts(anomalies or []))
+    with stage('report'):
+        user = os.path.basename(os.path.normpath(user_dir)) if user_dir else None
+        return build_health_report(merged_df, recent_df, recommendations, alerts, insights, user=user, peers=peers)
+
+
+def run_pipeline(user_dir, fmt='text', start=None, end=None):
+    """Load, preprocess, analyze and report on one user; returns the rendered report or None"""
+    report = build_report(*analyze_user(user_dir, start, end), user_dir=user_dir)
+    return render_report(report, fmt) if report is not None else None
@@ -1,126 +1,279 @@
-import os
-import re
-import pandas as pd
+import operator
 
-def generate_recommendations(merged_df, recent_df, processed_data):
-    """Generate personalized recommendations based on data analysis"""
-    recommendations = {'sleep': [], 'activity': [], 'recovery': [], 'general': []}
+from utils import is_missing
+
+RECOMMENDATION_SECTIONS = ['sleep', 'activity', 'recovery', 'general']
+
+OPERATORS = {'>=': operator.ge, '<': operator.lt}
+
+VALUE_FORMATTERS = {
+    'int': int,
+    'abs_round': lambda value: abs(round(value)),
+    'round1': lambda value: round(value, 1)
+}
+
+# Cohort percentiles at or beyond this distance from either end are called out as insights
+PEER_INSIGHT_PERCENTILE = 10
+
+
+def _rule(rule_id, kind, when, message, section=None, value=None):
+    """A declarative rule: fires on every row where all (column, op, threshold) conditions hold.
+
+    Every column named in `when` must also be present and non-missing. The
+    message may reference {value}, taken from the (column, formatter) pair.
+    """
+    return {'id': rule_id, 'kind': kind, 'section': section, 'when': when, 'message': message, 'value': value}
+
+
+def _score_band_rules(prefix, column, messages):
+    """Insight rules for the excellent/good/moderate/low bands of a 0-100 score"""
+    bands = [('excellent', [(column, '>=', 85)]),
+             ('good', [(column, '>=', 70), (column, '<', 85)]),
+             ('moderate', [(column, '>=', 50), (column, '<', 70)]),
+             ('low', [(column, '<', 50)])]
+    return [_rule(f'{prefix}_{band}', 'insight', when, messages[band], value=(column, None))
+            for band, when in bands]
+
+
+SLEEP_CONTRIBUTOR_ADVICE = [
+    ('contributors_deep_sleep', ["avoid alcohol and caffeine at least 6 hours before bedtime", "consider taking a warm bath 1-2 hours before sleep"]),
+    ('contributors_rem_sleep', ["practice stress-reduction techniques like meditation", "avoid using electronic devices 1 hour before bedtime"]),
+    ('contributors_efficiency', ["ensure your bedroom is cool (65-68°F/18-20°C), dark, and quiet", "consider using blackout curtains"]),
+    ('contributors_latency', ["practice progressive muscle relaxation or guided imagery", "avoid large meals, intense exercise close to bedtime"]),
+    ('contributors_timing', ["try to go to bed within the same 30-minute window each night"])
+]
+
+RECOVERY_CONTRIBUTOR_ADVICE = [
+    ('contributors_hrv_balance', ["practice stress management techniques like box breathing", "consider adding mindfulness meditation"]),
+    ('contributors_recovery_index', ["ensure adequate rest", "try active recovery techniques like foam rolling"]),
+    ('contributors_resting_heart_rate', ["your resting heart rate is elevated", "stay well-hydrated and consider increasing electrolyte intake"]),
+    ('contributors_body_temperature', ["your body temperature is elevated", "monitor for signs of illness"])
+]
+
+# Rules are listed in output order: within each list (insights, alerts, each
+# recommendation section) messages appear in the order their rules are defined.
+RULES = [
+    # ===== SLEEP =====
+    *_score_band_rules('sleep', 'score_sleep', {
+        'excellent': "Your sleep score of {value} is excellent. Keep maintaining your current sleep habits.",
+        'good': "Your sleep score of {value} is good. With some minor adjustments, you could optimize your sleep further.",
+        'moderate': "Your sleep score of {value} is moderate. There's room for improvement in your sleep quality.",
+        'low': "Your sleep score of {value} is low. Prioritizing sleep improvements could significantly benefit your overall health."
+    }),
+    _rule('sleep_schedule', 'recommendation', [('score_sleep', '<', 60)],
+          "Establish a consistent sleep schedule by going to bed and waking up at the same time every day, even on weekends.",
+          section='sleep'),
+    _rule('sleep_routine', 'recommendation', [('score_sleep', '<', 60)],
+          "Create a relaxing bedtime routine that signals to your body it's time to wind down (reading, gentle stretching, or meditation).",
+          section='sleep'),
+    *[_rule(f'sleep_{contrib}_{i}', 'recommendation', [('score_sleep', '<', 60), (contrib, '<', 70)],
+            f"To improve {contrib.split('_')[1]} sleep: {adv}", section='sleep')
+      for contrib, advice in SLEEP_CONTRIBUTOR_ADVICE for i, adv in enumerate(advice)],
+    _rule('sleep_trend_alert', 'alert', [('score_sleep', 'notna', None), ('sleep_trend', '<', -10)],
+          "⚠️ Your sleep quality has decreased by {value}% compared to your baseline.",
+          value=('sleep_trend', 'abs_round')),
+    _rule('sleep_trend', 'recommendation', [('score_sleep', 'notna', None), ('sleep_trend', '<', -10)],
+          "Your sleep quality has been declining. Consider tracking potential disruptors like stress, late meals, or screen time.",
+          section='sleep'),
+
+    # ===== READINESS & RECOVERY =====
+    *_score_band_rules('readiness', 'score', {
+        'excellent': "Your readiness score of {value} is excellent. Your body is well-recovered and prepared for challenging activities.",
+        'good': "Your readiness score of {value} is good. You're ready for moderate to high-intensity activities.",
+        'moderate': "Your readiness score of {value} is moderate. Consider moderate-intensity activities today.",
+        'low': "Your readiness score of {value} is low. Your body is signaling a need for recovery."
+    }),
+    _rule('recovery_rest', 'recommendation', [('score', '<', 60)],
+          "Your body is showing signs of needing recovery. Consider a rest day or light activity like walking or gentle yoga.",
+          section='recovery'),
+    _rule('recovery_nutrition', 'recommendation', [('score', '<', 60)],
+          "Focus on proper nutrition with emphasis on protein intake to support recovery and anti-inflammatory foods like berries, fatty fish, and leafy greens.",
+          section='recovery'),
+    *[_rule(f'recovery_{contrib}_{i}', 'recommendation', [('score', '<', 60), (contrib, '<', 70)],
+            f"{adv.capitalize()}.", section='recovery')
+      for contrib, advice in RECOVERY_CONTRIBUTOR_ADVICE for i, adv in enumerate(advice)],
+    _rule('readiness_trend_alert', 'alert', [('score', 'notna', None), ('readiness_trend', '<', -15)],
+          "⚠️ Your readiness has decreased by {value}% compared to your baseline.",
+          value=('readiness_trend', 'abs_round')),
+    _rule('readiness_trend', 'recommendation', [('score', 'notna', None), ('readiness_trend', '<', -15)],
+          "Your readiness has been declining significantly. Consider taking a recovery week with reduced training volume and intensity.",
+          section='recovery'),
+
+    # ===== ACTIVITY =====
+    *_score_band_rules('activity', 'score_activity', {
+        'excellent': "Your activity score of {value} is excellent. You're maintaining a high level of physical activity.",
+        'good': "Your activity score of {value} is good. You're meeting recommended activity levels.",
+        'moderate': "Your activity score of {value} is moderate. Increasing your daily movement would be beneficial.",
+        'low': "Your activity score of {value} is low. Finding ways to incorporate more movement into your day could improve your health."
+    }),
+    _rule('activity_movement', 'recommendation', [('score_activity', '<', 60)],
+          "Try to incorporate more movement throughout your day - take the stairs, park farther away, or schedule short walking breaks every hour.",
+          section='activity'),
+    _rule('activity_steps_goal', 'recommendation', [('score_activity', '<', 60)],
+          "Set a goal to achieve at least 7,500 steps daily, gradually increasing to 10,000 steps as your fitness improves.",
+          section='activity'),
+    _rule('activity_low_steps', 'recommendation', [('score_activity', '<', 60), ('steps', '<', 5000)],
+          "Your step count of {value} is below recommended levels. Aim to add 1,000 more steps each day this week.",
+          section='activity', value=('steps', 'int')),
+
+    # ===== BLOOD OXYGEN & HRV =====
+    _rule('spo2_low', 'alert', [('spo2_percentage', '<', 95)],
+          "⚠️ Your blood oxygen level of {value}% is below the optimal range.",
+          value=('spo2_percentage', None)),
+    _rule('spo2_healthy', 'insight', [('spo2_percentage', '>=', 95)],
+          "Your blood oxygen level of {value}% is within the healthy range.",
+          value=('spo2_percentage', None)),
+    *_score_band_rules('hrv', 'contributors_hrv_balance', {
+        'excellent': "Your HRV balance is excellent, indicating good autonomic nervous system function and stress resilience.",
+        'good': "Your HRV balance is good, suggesting adequate recovery and stress management.",
+        'moderate': "Your HRV balance is moderate. There's room for improvement in recovery and stress management.",
+        'low': "Your HRV balance is low, indicating potential stress, fatigue, or incomplete recovery."
+    }),
+
+    # ===== INTRADAY HEART RATE =====
+    _rule('night_rhr_alert', 'alert', [('night_rhr_trend', '>=', 10)],
+          "⚠️ Your nighttime resting heart rate is {value}% above your 7-day baseline, which can signal stress, illness or incomplete recovery.",
+          value=('night_rhr_trend', 'abs_round')),
+    _rule('night_rhr_elevated', 'recommendation', [('night_rhr_trend', '>=', 10)],
+          "Your nighttime heart rate is elevated. Avoid alcohol and heavy meals in the evening and prioritize an early night.",
+          section='recovery'),
+    _rule('slow_hr_recovery', 'insight', [('hr_recovery_slope', '>=', -1)],
+          "Your heart rate came down slowly after today's peak ({value} bpm/min), a sign your cardiovascular system may still be recovering.",
+          value=('hr_recovery_slope', 'round1')),
+
+    # ===== GENERAL =====
+    _rule('general_hydration', 'recommendation', [('score', '<', 70)],
+          "Ensure adequate hydration by drinking at least half your body weight (in pounds) in ounces of water daily, especially on active days and during recovery.",
+          section='general')
+]
+
+
+def _rule_mask(df, rule):
+    """Boolean mask of the rows of df on which rule fires"""
+    import numpy as np
+
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, threshold in rule['when']:
+        if col not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        mask &= ~np.isnan(values)
+        if op != 'notna':
+            mask &= OPERATORS[op](values, threshold)
+    return mask
+
+
+def evaluate_rules(df, rules=RULES):
+    """Evaluate every rule over all rows of df in one vectorized pass.
+
+    Returns one row per fired rule per day (columns: day, rule_id, kind,
+    section, message), ordered by day and then by rule order.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fired = []
+    for order, rule in enumerate(rules):
+        rows = np.flatnonzero(_rule_mask(df, rule))
+        if not len(rows):
+            continue
+        if rule['value'] is None:
+            messages = [rule['message']] * len(rows)
+        else:
+            col, fmt = rule['value']
+            formatter = VALUE_FORMATTERS.get(fmt, lambda value: value)
+            messages = [rule['message'].format(value=formatter(value)) for value in df[col].iloc[rows].tolist()]
+        fired.append(pd.DataFrame({
+            'row': rows, 'order': order, 'day': df['day'].iloc[rows].values, 'rule_id': rule['id'],
+            'kind': rule['kind'], 'section': rule['section'], 'message': messages
+        }))
+
+    if not fired:
+        return pd.DataFrame(columns=['day', 'rule_id', 'kind', 'section', 'message'])
+    result = pd.concat(fired, ignore_index=True).sort_values(['row', 'order'], kind='stable')
+    return result.drop(columns=['row', 'order']).reset_index(drop=True)
+
+
+def _rule_fires(row, rule):
+    """Whether rule fires on one row (any mapping of column to value)"""
+    for col, op, threshold in rule['when']:
+        value = row.get(col)
+        if is_missing(value):
+            return False
+        if op != 'notna' and not OPERATORS[op](float(value), threshold):
+            return False
+    return True
+
+
+def evaluate_rules_row(row, rules=RULES):
+    """evaluate_rules for a single day, in plain Python: (kind, section, message) per fired rule"""
+    fired = []
+    for rule in rules:
+        if not _rule_fires(row, rule):
+            continue
+        message = rule['message']
+        if rule['value'] is not None:
+            col, fmt = rule['value']
+            value = row[col].item() if hasattr(row[col], 'item') else row[col]
+            message = message.format(value=VALUE_FORMATTERS.get(fmt, lambda value: value)(value))
+        fired.append((rule['kind'], rule['section'], message))
+    return fired
+
+
+def _split_fired(fired):
+    """Sort (kind, section, message) triples into recommendations, alerts and insights"""
+    recommendations = {section: [] for section in RECOMMENDATION_SECTIONS}
     alerts = []
     insights = []
+    for kind, section, message in fired:
+        if kind == 'recommendation':
+            recommendations[section].append(message)
+        elif kind == 'alert':
+            alerts.append(message)
+        else:
+            insights.append(message)
+    return recommendations, alerts, insights
+
+
+def summarize_fired_rules(fired, day=None):
+    """Split the rules fired on one day into recommendations, alerts and insights.
+
+    day defaults to the latest day on which any rule fired.
+    """
+    if fired.empty:
+        return _split_fired([])
+
+    day_rules = fired[fired['day'] == (fired['day'].max() if day is None else day)]
+    return _split_fired(zip(day_rules['kind'], day_rules['section'], day_rules['message']))
 
+
+def peer_insights(percentiles):
+    """Insights for metrics where the user stands out within their cohort"""
+    insights = []
+    for p in percentiles:
+        # The user is one of the cohort's users, so never claim all of them
+        if p['percentile'] >= 100 - PEER_INSIGHT_PERCENTILE:
+            side = f"higher than {min(p['percentile'], 99)}%"
+        elif p['percentile'] <= PEER_INSIGHT_PERCENTILE:
+            side = f"lower than {min(100 - p['percentile'], 99)}%"
+        else:
+            continue
+        insights.append(f"Your typical {p['label']} ({p['value']:g}) is {side} of users in your cohort "
+                        f"({p['cohort_label']}, median {p['cohort_median']:g}).")
+    return insights
+
+
+def generate_recommendations(merged_df, recent_df, processed_data, percentiles=None):
+    """Generate personalized recommendations based on data analysis"""
     if recent_df is None or recent_df.empty:
         print("No recent data available for recommendations.")
-        return recommendations, alerts, insights
-
-    latest = recent_df.iloc[-1]
-    dir_name = os.path.basename(os.path.dirname(os.path.abspath('.')))
-    user_profile = {
-        'gender': 'male' if 'MALE' in dir_name else 'female' if 'FEMALE' in dir_name else None,
-        'height_ft': int(m.group(1)) if (m := re.search(r'(\d+)_FT', dir_name)) else None,
-        'weight_lb': int(m.group(1)) if (m := re.search(r'(\d+)_LB', dir_name)) else None
-    }
-
-    # ===== SLEEP RECOMMENDATIONS =====
-    if 'score_sleep' in latest and not pd.isna(latest['score_sleep']):
-        sleep_score = latest['score_sleep']
-        if sleep_score >= 85:
-            insights.append(f"Your sleep score of {sleep_score} is excellent. Keep maintaining your current sleep habits.")
-        elif sleep_score >= 70:
-            insights.append(f"Your sleep score of {sleep_score} is good. With some minor adjustments, you could optimize your sleep further.")
-        elif sleep_score >= 50:
-            insights.append(f"Your sleep score of {sleep_score} is moderate. There's room for improvement in your sleep quality.")
-        else:
-            insights.append(f"Your sleep score of {sleep_score} is low. Prioritizing sleep improvements could significantly benefit your overall health.")
-
-        if sleep_score < 60:
-            recommendations['sleep'].append("Establish a consistent sleep schedule by going to bed and waking up at the same time every day, even on weekends.")
-            recommendations['sleep'].append("Create a relaxing bedtime routine that signals to your body it's time to wind down (reading, gentle stretching, or meditation).")
-            for contrib, advice in [
-                ('contributors_deep_sleep', ["avoid alcohol and caffeine at least 6 hours before bedtime", "consider taking a warm bath 1-2 hours before sleep"]),
-                ('contributors_rem_sleep', ["practice stress-reduction techniques like meditation", "avoid using electronic devices 1 hour before bedtime"]),
-                ('contributors_efficiency', ["ensure your bedroom is cool (65-68°F/18-20°C), dark, and quiet", "consider using blackout curtains"]),
-                ('contributors_latency', ["practice progressive muscle relaxation or guided imagery", "avoid large meals, intense exercise close to bedtime"]),
-                ('contributors_timing', ["try to go to bed within the same 30-minute window each night"])
-            ]:
-                if contrib in latest and not pd.isna(latest[contrib]) and latest[contrib] < 70:
-                    recommendations['sleep'].extend([f"To improve {contrib.split('_')[1]} sleep: {adv}" for adv in advice])
-
-        if 'sleep_trend' in latest and not pd.isna(latest['sleep_trend']) and latest['sleep_trend'] < -10:
-            alerts.append(f"⚠️ Your sleep quality has decreased by {abs(round(latest['sleep_trend']))}% compared to your baseline.")
-            recommendations['sleep'].append("Your sleep quality has been declining. Consider tracking potential disruptors like stress, late meals, or screen time.")
-
-    # ===== READINESS & RECOVERY RECOMMENDATIONS =====
-    if 'score' in latest and not pd.isna(latest['score']):
-        readiness_score = latest['score']
-        if readiness_score >= 85:
-            insights.append(f"Your readiness score of {readiness_score} is excellent. Your body is well-recovered and prepared for challenging activities.")
-        elif readiness_score >= 70:
-            insights.append(f"Your readiness score of {readiness_score} is good. You're ready for moderate to high-intensity activities.")
-        elif readiness_score >= 50:
-            insights.append(f"Your readiness score of {readiness_score} is moderate. Consider moderate-intensity activities today.")
-        else:
-            insights.append(f"Your readiness score of {readiness_score} is low. Your body is signaling a need for recovery.")
-
-        if readiness_score < 60:
-            recommendations['recovery'].extend([
-                "Your body is showing signs of needing recovery. Consider a rest day or light activity like walking or gentle yoga.",
-                "Focus on proper nutrition with emphasis on protein intake to support recovery and anti-inflammatory foods like berries, fatty fish, and leafy greens."
-            ])
-            for contrib, advice in [
-                ('contributors_hrv_balance', ["practice stress management techniques like box breathing", "consider adding mindfulness meditation"]),
-                ('contributors_recovery_index', ["ensure adequate rest", "try active recovery techniques like foam rolling"]),
-                ('contributors_resting_heart_rate', ["your resting heart rate is elevated", "stay well-hydrated and consider increasing electrolyte intake"]),
-                ('contributors_body_temperature', ["your body temperature is elevated", "monitor for signs of illness"])
-            ]:
-                if contrib in latest and not pd.isna(latest[contrib]) and latest[contrib] < 70:
-                    recommendations['recovery'].extend([f"{adv.capitalize()}." for adv in advice])
-
-        if 'readiness_trend' in latest and not pd.isna(latest['readiness_trend']) and latest['readiness_trend'] < -15:
-            alerts.append(f"⚠️ Your readiness has decreased by {abs(round(latest['readiness_trend']))}% compared to your baseline.")
-            recommendations['recovery'].append("Your readiness has been declining significantly. Consider taking a recovery week with reduced training volume and intensity.")
-
-    # ===== ACTIVITY RECOMMENDATIONS =====
-    if 'score_activity' in latest and not pd.isna(latest['score_activity']):
-        activity_score = latest['score_activity']
-        if activity_score >= 85:
-            insights.append(f"Your activity score of {activity_score} is excellent. You're maintaining a high level of physical activity.")
-        elif activity_score >= 70:
-            insights.append(f"Your activity score of {activity_score} is good. You're meeting recommended activity levels.")
-        elif activity_score >= 50:
-            insights.append(f"Your activity score of {activity_score} is moderate. Increasing your daily movement would be beneficial.")
-        else:
-            insights.append(f"Your activity score of {activity_score} is low. Finding ways to incorporate more movement into your day could improve your health.")
-
-        if activity_score < 60:
-            recommendations['activity'].extend([
-                "Try to incorporate more movement throughout your day - take the stairs, park farther away, or schedule short walking breaks every hour.",
-                "Set a goal to achieve at least 7,500 steps daily, gradually increasing to 10,000 steps as your fitness improves."
-            ])
-            if 'steps' in latest and not pd.isna(latest['steps']) and latest['steps'] < 5000:
-                recommendations['activity'].append(f"Your step count of {int(latest['steps'])} is below recommended levels. Aim to add 1,000 more steps each day this week.")
-            # Add more activity contributor logic as needed
-
-    # Add more sections (balance, patterns, etc.) as per original code if needed
-    # For brevity, I've included core sections only
-
-    if 'spo2_percentage' in latest and not pd.isna(latest['spo2_percentage']):
-        if latest['spo2_percentage'] < 95:
-            alerts.append(f"⚠️ Your blood oxygen level of {latest['spo2_percentage']}% is below the optimal range.")
-        else:
-            insights.append(f"Your blood oxygen level of {latest['spo2_percentage']}% is within the healthy range.")
-
-    if 'contributors_hrv_balance' in latest and not pd.isna(latest['contributors_hrv_balance']):
-        hrv = latest['contributors_hrv_balance']
-        if hrv >= 85:
-            insights.append("Your HRV balance is excellent, indicating good autonomic nervous system function and stress resilience.")
-        elif hrv >= 70:
-            insights.append("Your HRV balance is good, suggesting adequate recovery and stress management.")
-        elif hrv >= 50:
-            insights.append("Your HRV balance is moderate. There's room for improvement in recovery and stress management.")
-        else:
-            insights.append("Your HRV balance is low, indicating potential stress, fatigue, or incomplete recovery.")
+        return {section: [] for section in RECOMMENDATION_SECTIONS}, [], []
+
+    return recommend_for_day(recent_df.iloc[-1].to_dict(), percentiles)
 
-    if 'score' in latest and not pd.isna(latest['score']) and latest['score'] < 70:
-        recommendations['general'].append("Ensure adequate hydration by drinking at least half your body weight (in pounds) in ounces of water daily, especially on active days and during recovery.")
 
-    return recommendations, alerts, insights
\ No newline at end of file
+def recommend_for_day(row, percentiles=None):
+    """Recommendations, alerts and insights for one day's metrics; needs neither pandas nor NumPy"""
+    recommendations, alerts, insights = _split_fired(evaluate_rules_row(row))
+    insights.extend(peer_insights(percentiles or []))
+    return recommendations, alerts, insights
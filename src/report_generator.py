@@ -1,86 +1,231 @@
-import pandas as pd
+import html
+import json
+from dataclasses import asdict, dataclass, field
 
-def generate_health_report(merged_df, recent_df, recommendations, alerts, insights):
-    """Generate a comprehensive health report"""
+from utils import is_missing
+
+METRICS = {
+    'score': ('Readiness Score', '/100'),
+    'score_sleep': ('Sleep Score', '/100'),
+    'score_activity': ('Activity Score', '/100'),
+    'steps': ('Steps', ''),
+    'total_calories': ('Total Calories', ''),
+    'spo2_percentage': ('Blood Oxygen', '%')
+}
+
+TRENDS = {
+    'readiness_trend': 'Readiness',
+    'sleep_trend': 'Sleep',
+    'activity_trend': 'Activity',
+    'hrv_trend': 'HRV Balance'
+}
+
+RECOMMENDATION_TITLES = [
+    ('sleep', 'SLEEP OPTIMIZATION'),
+    ('activity', 'ACTIVITY GUIDANCE'),
+    ('recovery', 'RECOVERY STRATEGIES'),
+    ('general', 'GENERAL HEALTH')
+]
+
+DISCLAIMER = [
+    "This report is based on your personal health data and is intended for informational purposes only.",
+    "Always consult with healthcare professionals before making significant changes to your health routine."
+]
+
+
+@dataclass
+class HealthReport:
+    """Everything a health report says, independent of how it is rendered"""
+    report_date: str
+    metrics: list = field(default_factory=list)  # {'key', 'label', 'value', 'unit'}
+    insights: list = field(default_factory=list)
+    alerts: list = field(default_factory=list)
+    recommendations: dict = field(default_factory=dict)
+    trends: list = field(default_factory=list)  # {'key', 'label', 'value', 'direction', 'percent'}
+    peers: list = field(default_factory=list)  # cohort_percentile results
+    user: str = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _scalar(value):
+    """Plain Python value for a NumPy/pandas scalar, so reports serialize cleanly"""
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _ordinal(n):
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f"{n}{suffix}"
+
+
+def _peer_line(peer):
+    # The user is one of the cohort's users, so never place them beyond all of them
+    percentile = min(max(peer['percentile'], 1), 99)
+    return (f"{peer['label'][0].upper()}{peer['label'][1:]}: {_ordinal(percentile)} percentile "
+            f"of {peer['cohort_label']} (cohort median {peer['cohort_median']:g})")
+
+
+def build_health_report(merged_df, recent_df, recommendations, alerts, insights, user=None, peers=None):
+    """Assemble the structured report for the latest day, or None without recent data"""
     if recent_df is None or recent_df.empty:
-        return "No data available to generate health report."
+        return None
 
     latest = recent_df.iloc[-1]
-    report = [
+    report = HealthReport(report_date=latest['day'].strftime('%Y-%m-%d'), insights=list(insights),
+                          alerts=list(alerts), recommendations={k: list(v) for k, v in recommendations.items()},
+                          peers=list(peers or []), user=user)
+
+    for key, (label, unit) in METRICS.items():
+        if key in latest and not is_missing(latest[key]):
+            value = int(latest[key]) if key in ['steps', 'total_calories'] else _scalar(latest[key])
+            report.metrics.append({'key': key, 'label': label, 'value': value, 'unit': unit})
+
+    for key, label in TRENDS.items():
+        if key in latest and not is_missing(latest[key]):
+            value = float(latest[key])
+            report.trends.append({'key': key, 'label': label, 'value': value,
+                                  'direction': "↑" if value > 0 else "↓", 'percent': abs(round(value))})
+
+    return report
+
+
+def render_text(report):
+    """Plain-text report, as printed to the console"""
+    lines = [
         "=" * 80,
         "PERSONALIZED HEALTH INSIGHTS & RECOMMENDATIONS",
         "=" * 80,
-        f"Report Date: {latest['day'].strftime('%Y-%m-%d')}",
+        f"Report Date: {report.report_date}",
         ""
     ]
 
     # Current Status
-    report.extend(["-" * 80, "CURRENT STATUS", "-" * 80])
-    metrics = {
-        'score': 'Readiness Score',
-        'score_sleep': 'Sleep Score',
-        'score_activity': 'Activity Score',
-        'steps': 'Steps',
-        'total_calories': 'Total Calories',
-        'spo2_percentage': 'Blood Oxygen'
-    }
-    for key, label in metrics.items():
-        if key in latest and not pd.isna(latest[key]):
-            value = int(latest[key]) if key in ['steps', 'total_calories'] else latest[key]
-            unit = '%' if key == 'spo2_percentage' else '/100'
-            report.append(f"{label}: {value}{unit}")
-
-    report.append("")
+    lines.extend(["-" * 80, "CURRENT STATUS", "-" * 80])
+    for metric in report.metrics:
+        lines.append(f"{metric['label']}: {metric['value']}{metric['unit']}")
+    lines.append("")
 
     # Insights
-    if insights:
-        report.extend(["-" * 80, "INSIGHTS", "-" * 80])
-        for insight in insights:
-            report.append(f"• {insight}")
-        report.append("")
+    if report.insights:
+        lines.extend(["-" * 80, "INSIGHTS", "-" * 80])
+        for insight in report.insights:
+            lines.append(f"• {insight}")
+        lines.append("")
 
     # Alerts
-    if alerts:
-        report.extend(["-" * 80, "ALERTS", "-" * 80])
-        for alert in alerts:
-            report.append(alert)
-        report.append("")
+    if report.alerts:
+        lines.extend(["-" * 80, "ALERTS", "-" * 80])
+        lines.extend(report.alerts)
+        lines.append("")
 
     # Recommendations
-    if any(recommendations.values()):
-        report.extend(["-" * 80, "RECOMMENDATIONS", "-" * 80])
-        for section, title in [
-            ('sleep', 'SLEEP OPTIMIZATION'),
-            ('activity', 'ACTIVITY GUIDANCE'),
-            ('recovery', 'RECOVERY STRATEGIES'),
-            ('general', 'GENERAL HEALTH')
-        ]:
-            if recommendations[section]:
-                report.append(f"\n{title}:")
-                for i, rec in enumerate(recommendations[section], 1):
-                    report.append(f"{i}. {rec}")
-
-        report.append("")
+    if any(report.recommendations.values()):
+        lines.extend(["-" * 80, "RECOMMENDATIONS", "-" * 80])
+        for section, title in RECOMMENDATION_TITLES:
+            if report.recommendations.get(section):
+                lines.append(f"\n{title}:")
+                for i, rec in enumerate(report.recommendations[section], 1):
+                    lines.append(f"{i}. {rec}")
+        lines.append("")
 
     # Weekly Trends
-    report.extend(["-" * 80, "WEEKLY TRENDS", "-" * 80])
-    trends = {
-        'readiness_trend': 'Readiness',
-        'sleep_trend': 'Sleep',
-        'activity_trend': 'Activity',
-        'hrv_trend': 'HRV Balance'
-    }
-    for key, label in trends.items():
-        if key in latest and not pd.isna(latest[key]):
-            trend = "↑" if latest[key] > 0 else "↓"
-            report.append(f"{label}: {trend} {abs(round(latest[key]))}% compared to your baseline")
-
-    report.extend([
-        "",
-        "=" * 80,
-        "This report is based on your personal health data and is intended for informational purposes only.",
-        "Always consult with healthcare professionals before making significant changes to your health routine.",
-        "=" * 80
-    ])
+    lines.extend(["-" * 80, "WEEKLY TRENDS", "-" * 80])
+    for trend in report.trends:
+        lines.append(f"{trend['label']}: {trend['direction']} {trend['percent']}% compared to your baseline")
+
+    # Peer Comparison
+    if report.peers:
+        lines.extend(["", "-" * 80, "PEER COMPARISON", "-" * 80])
+        lines.extend(_peer_line(peer) for peer in report.peers)
+
+    lines.extend(["", "=" * 80, *DISCLAIMER, "=" * 80])
+    return "\n".join(lines)
+
+
+def render_markdown(report):
+    """Markdown report with one section per part"""
+    lines = ["# Personalized Health Insights & Recommendations", "", f"**Report Date:** {report.report_date}", "",
+             "## Current Status", ""]
+    lines.extend(f"- **{m['label']}:** {m['value']}{m['unit']}" for m in report.metrics)
+
+    if report.insights:
+        lines.extend(["", "## Insights", ""])
+        lines.extend(f"- {insight}" for insight in report.insights)
+    if report.alerts:
+        lines.extend(["", "## Alerts", ""])
+        lines.extend(f"- {alert}" for alert in report.alerts)
+    if any(report.recommendations.values()):
+        lines.extend(["", "## Recommendations"])
+        for section, title in RECOMMENDATION_TITLES:
+            if report.recommendations.get(section):
+                lines.extend(["", f"### {title.title()}", ""])
+                lines.extend(f"{i}. {rec}" for i, rec in enumerate(report.recommendations[section], 1))
+
+    lines.extend(["", "## Weekly Trends", ""])
+    lines.extend(f"- **{t['label']}:** {t['direction']} {t['percent']}% compared to your baseline"
+                 for t in report.trends)
+    if report.peers:
+        lines.extend(["", "## Peer Comparison", ""])
+        lines.extend(f"- {_peer_line(peer)}" for peer in report.peers)
+    lines.extend(["", "---", "", *(f"_{line}_" for line in DISCLAIMER)])
+    return "\n".join(lines) + "\n"
+
+
+def render_html(report):
+    """Standalone HTML page"""
+    def items(values, tag='ul'):
+        return f"<{tag}>" + "".join(f"<li>{html.escape(str(v))}</li>" for v in values) + f"</{tag}>"
+
+    parts = ["<!DOCTYPE html>", "<html><head><meta charset=\"utf-8\">",
+             "<title>Health Report</title></head><body>",
+             "<h1>Personalized Health Insights &amp; Recommendations</h1>",
+             f"<p><strong>Report Date:</strong> {html.escape(report.report_date)}</p>",
+             "<h2>Current Status</h2>",
+             items(f"{m['label']}: {m['value']}{m['unit']}" for m in report.metrics)]
+    if report.insights:
+        parts.extend(["<h2>Insights</h2>", items(report.insights)])
+    if report.alerts:
+        parts.extend(["<h2>Alerts</h2>", items(report.alerts)])
+    if any(report.recommendations.values()):
+        parts.append("<h2>Recommendations</h2>")
+        for section, title in RECOMMENDATION_TITLES:
+            if report.recommendations.get(section):
+                parts.extend([f"<h3>{html.escape(title.title())}</h3>",
+                              items(report.recommendations[section], 'ol')])
+    parts.extend(["<h2>Weekly Trends</h2>",
+                  items(f"{t['label']}: {t['direction']} {t['percent']}% compared to your baseline"
+                        for t in report.trends)])
+    if report.peers:
+        parts.extend(["<h2>Peer Comparison</h2>", items(_peer_line(peer) for peer in report.peers)])
+    parts.extend(["<footer>" + "<br>".join(html.escape(line) for line in DISCLAIMER) + "</footer>",
+                  "</body></html>"])
+    return "\n".join(parts) + "\n"
 
-    return "\n".join(report)
\ No newline at end of file
+
+def render_json(report):
+    return json.dumps(report.to_dict(), ensure_ascii=False, indent=2)
+
+
+# Output format -> (renderer, file extension)
+RENDERERS = {
+    'text': (render_text, 'txt'),
+    'json': (render_json, 'json'),
+    'html': (render_html, 'html'),
+    'markdown': (render_markdown, 'md')
+}
+
+
+def render_report(report, fmt='text'):
+    """Render a HealthReport in one of the RENDERERS formats"""
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown report format {fmt!r}; expected one of {', '.join(RENDERERS)}")
+    return RENDERERS[fmt][0](report)
+
+
+def generate_health_report(merged_df, recent_df, recommendations, alerts, insights):
+    """Generate a comprehensive health report"""
+    report = build_health_report(merged_df, recent_df, recommendations, alerts, insights)
+    if report is None:
+        return "No data available to generate health report."
+    return render_text(report)
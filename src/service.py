@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import os
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from utils import ARCHIVE_PATH, discover_user_directories, index_directory
+from data_loader import FILE_REGEXES
+from cohort import cohort_index_path
+from pipeline import analyze_user, build_report
+from report_generator import render_text
+
+warnings.filterwarnings('ignore')
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+HTTP_REASONS = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed', 400: 'Bad Request',
+                422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+
+def export_signature(user_dir):
+    """Identify the current exports of a user: latest file per dataset with its size and mtime.
+
+    The cohort index is included too, since peer percentiles change when it is rebuilt.
+    """
+    signature = []
+    for key, path in sorted(index_directory(user_dir, FILE_REGEXES).items()):
+        stat = os.stat(path)
+        signature.append((key, path, stat.st_size, stat.st_mtime_ns))
+    index_path = cohort_index_path(os.path.dirname(os.path.normpath(user_dir)))
+    if os.path.exists(index_path):
+        stat = os.stat(index_path)
+        signature.append(('cohort_index', index_path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def _build_entry(user_dir, signature):
+    """Analyze one user and render its report; runs in the executor"""
+    report = build_report(*analyze_user(user_dir), user_dir=user_dir)
+    entry = {'signature': signature, 'report': None}
+    if report is not None:
+        entry['report'] = {**report.to_dict(), 'text': render_text(report)}
+    # What a response costs to hold: the report as it is sent
+    entry['nbytes'] = len(json.dumps(entry['report'], ensure_ascii=False, default=str).encode('utf-8'))
+    return entry
+
+
+class UserStateCache:
+    """LRU cache of per-user reports, bounded by their total serialized size.
+
+    A new export replaces every dataset file at once, so analyzed frames could
+    not be reused after one; the state that carries over between exports (the
+    Parquet cache and anomaly state) lives on disk.
+    """
+
+    def __init__(self, memory_budget_bytes):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, user, signature):
+        entry = self.entries.get(user)
+        if entry is None or entry['signature'] != signature:
+            return None
+        self.entries.move_to_end(user)
+        return entry
+
+    def put(self, user, entry):
+        self.discard(user)
+        self.entries[user] = entry
+        self.nbytes += entry['nbytes']
+        # The newest entry is always kept, even if it alone exceeds the budget
+        while self.nbytes > self.memory_budget_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted['nbytes']
+
+    def discard(self, user):
+        entry = self.entries.pop(user, None)
+        if entry is not None:
+            self.nbytes -= entry['nbytes']
+
+
+class ReportService:
+    """Serves per-user reports from an in-memory cache, rebuilding an entry when its exports change"""
+
+    def __init__(self, archive_path=ARCHIVE_PATH, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, workers=None):
+        self.archive_path = archive_path
+        self.cache = UserStateCache(memory_budget_mb * 1024 * 1024)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.locks = {}
+        self._user_dirs = None  # (archive mtime_ns, {user: directory})
+
+    def user_dirs(self):
+        """user -> directory, rescanned only when the archive directory changes; runs in the executor"""
+        mtime = os.stat(self.archive_path).st_mtime_ns
+        if self._user_dirs is None or self._user_dirs[0] != mtime:
+            self._user_dirs = (mtime, {os.path.basename(d): d for d in discover_user_directories(self.archive_path)})
+        return self._user_dirs[1]
+
+    async def report(self, user, user_dir):
+        """Return the report payload for a user, or None if there is too little data"""
+        loop = asyncio.get_running_loop()
+        # One build per user at a time; concurrent requests wait for it and share the result
+        async with self.locks.setdefault(user, asyncio.Lock()):
+            signature = await loop.run_in_executor(self.executor, export_signature, user_dir)
+            entry = self.cache.get(user, signature)
+            if entry is None:
+                entry = await loop.run_in_executor(self.executor, _build_entry, user_dir, signature)
+                self.cache.put(user, entry)
+        return entry['report']
+
+    async def handle(self, method, path):
+        """Route one request; returns (status, payload)"""
+        if method != 'GET':
+            return 405, {'error': f"Method {method} not allowed"}
+
+        parts = [unquote(part) for part in urlsplit(path).path.strip('/').split('/')]
+        if parts == ['health']:
+            return 200, {'status': 'ok', 'cached_users': len(self.cache.entries), 'cache_bytes': self.cache.nbytes}
+        if parts == ['users']:
+            user_dirs = await asyncio.get_running_loop().run_in_executor(self.executor, self.user_dirs)
+            return 200, {'users': sorted(user_dirs)}
+        if len(parts) == 3 and parts[0] == 'users' and parts[2] == 'report':
+            user = parts[1]
+            user_dirs = await asyncio.get_running_loop().run_in_executor(self.executor, self.user_dirs)
+            user_dir = user_dirs.get(user)
+            if user_dir is None:
+                return 404, {'error': f"Unknown user {user}"}
+            report = await self.report(user, user_dir)
+            if report is None:
+                return 422, {'error': "Insufficient data for analysis."}
+            return 200, report
+        return 404, {'error': f"No route for {path}"}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # headers are not needed: only bodiless GET requests are served
+            if len(request_line) != 3:
+                status, payload = 400, {'error': "Malformed request"}
+            else:
+                try:
+                    status, payload = await self.handle(request_line[0], request_line[1])
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            writer.write((f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                          "Content-Type: application/json; charset=utf-8\r\n"
+                          f"Content-Length: {len(body)}\r\n"
+                          "Connection: close\r\n\r\n").encode('latin-1') + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        print(f"Serving health reports on http://{host}:{port}/users/<id>/report")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve health reports over a local HTTP/JSON API.")
+    parser.add_argument('--archive', default=ARCHIVE_PATH, help="directory containing one folder per user")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help="memory budget for cached per-user state")
+    parser.add_argument('--workers', type=int, default=None, help="threads for loading and analysis")
+    args = parser.parse_args()
+
+    service = ReportService(args.archive, args.memory_mb, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,47 @@
+import gzip
+import json
 import os
 import re
 import sys
+from collections import OrderedDict
 from datetime import datetime
 
 
-def list_user_directories():
+ARCHIVE_PATH = os.path.join("..", "archive")
+
+
+def discover_user_directories(archive_path=ARCHIVE_PATH):
+    """Return the path of every user directory in the archive folder, sorted by name"""
+    return [os.path.join(archive_path, d) for d in sorted(os.listdir(archive_path))
+            if os.path.isdir(os.path.join(archive_path, d))]
+
+
+def is_missing(value):
+    """pd.isna for a single value, without importing pandas"""
+    try:
+        return value is None or bool(value != value)  # NaN and NaT are the only values unequal to themselves
+    except TypeError:  # pd.NA refuses to be used as a bool
+        return True
+
+
+def parse_user_profile(dir_name):
+    """Gender, height and weight encoded in a user directory name such as MALE_6_FT_180_LB"""
+    name = dir_name.upper()
+    return {
+        # FEMALE contains MALE, so it has to be checked first
+        'gender': 'female' if 'FEMALE' in name else 'male' if 'MALE' in name else None,
+        'height_ft': int(m.group(1)) if (m := re.search(r'(\d+)_FT', name)) else None,
+        'weight_lb': int(m.group(1)) if (m := re.search(r'(\d+)_LB', name)) else None
+    }
+
+
+def list_user_directories(archive_path=ARCHIVE_PATH):
     """List all directories in the archive folder and let user select one"""
-    archive_path = os.path.join("..", "archive")
     if not os.path.exists(archive_path):
         print(f"Error: {archive_path} directory not found.")
         sys.exit(1)
 
-    user_dirs = [d for d in os.listdir(archive_path) if os.path.isdir(os.path.join(archive_path, d))]
+    user_dirs = [os.path.basename(d) for d in discover_user_directories(archive_path)]
     if not user_dirs:
         print(f"No user directories found in {archive_path}.")
         sys.exit(1)
@@ -33,25 +63,83 @@ def list_user_directories():
             print("Please enter a valid number")
 
 
+TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})')
+
+# (directory, patterns) -> (mtime_ns, {name: path}), least recently used first; an index
+# is reused until the directory changes
+_directory_indexes = OrderedDict()
+DIRECTORY_INDEX_LIMIT = 1024
+
+
+def extract_file_timestamp(filename):
+    """Return the export timestamp embedded in an Oura file name, or "" if absent"""
+    match = TIMESTAMP_PATTERN.search(filename)
+    return match.group(1) if match else ""
+
+
+def index_directory(directory, patterns):
+    """Map each name in patterns to the latest file in directory matching its regex.
+
+    The directory is scanned once for all patterns, and the result is memoized
+    until the directory's mtime changes (files added, removed or renamed). Up
+    to DIRECTORY_INDEX_LIMIT (directory, patterns) indexes are kept, evicting
+    the least recently used. Names without a matching file are absent from the result.
+    """
+    patterns = tuple(patterns.items())
+    key = (os.path.abspath(directory), patterns)
+    mtime = os.stat(directory).st_mtime_ns
+    cached = _directory_indexes.get(key)
+    if cached and cached[0] == mtime:
+        _directory_indexes.move_to_end(key)
+        return dict(cached[1])
+
+    compiled = [(name, re.compile(pattern)) for name, pattern in patterns]
+    latest = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            for name, regex in compiled:
+                if regex.match(entry.name):
+                    timestamp = extract_file_timestamp(entry.name)
+                    # Strict comparison keeps the first file in listing order on ties, as sorted() did
+                    if name not in latest or timestamp > latest[name][0]:
+                        latest[name] = (timestamp, entry.name)
+
+    index = {name: os.path.join(directory, filename) for name, (_, filename) in latest.items()}
+    _directory_indexes[key] = (mtime, index)
+    _directory_indexes.move_to_end(key)
+    while len(_directory_indexes) > DIRECTORY_INDEX_LIMIT:
+        _directory_indexes.popitem(last=False)
+    return dict(index)
+
+
 def find_latest_file(directory, pattern):
     """Find the latest file in directory matching the pattern"""
-    matching_files = [f for f in os.listdir(directory) if re.match(pattern, f)]
-    if not matching_files:
-        return None
+    return index_directory(directory, {pattern: pattern}).get(pattern)
 
-    latest_file = sorted(matching_files,
-                         key=lambda x: re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})', x).group(1)
-                         if re.search(r'(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2})', x) else "",
-                         reverse=True)[0]
-    return os.path.join(directory, latest_file)
 
-
-def save_report(report, reports_dir=os.path.join("..", "reports")):  # Changed default to parent directory
+def save_report(report, reports_dir=os.path.join("..", "reports"), extension="txt"):  # Changed default to parent directory
     """Save report to file with UTF-8 encoding"""
     if not os.path.exists(reports_dir):
         os.makedirs(reports_dir)
 
-    filename = os.path.join(reports_dir, f"health_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+    filename = os.path.join(reports_dir, f"health_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}")
     with open(filename, "w", encoding="utf-8") as f:
         f.write(report)
-    return filename
\ No newline at end of file
+    return filename
+
+
+def open_report_bundle(path):
+    """Open a JSON Lines file for many reports; gzip-compressed if path ends in .gz"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def write_report_line(bundle, report_dict):
+    """Append one structured report to an open bundle as a single JSON line"""
+    bundle.write(json.dumps(report_dict, ensure_ascii=False, default=str) + "\n")
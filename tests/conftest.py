@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The pipeline modules import each other as top-level modules, as when run from src/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from generate_data import generate_user  # noqa: E402
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """An archive holding one synthetic user with 60 days of exports"""
+    generate_user(str(tmp_path / 'archive' / 'MALE_6_FT_180_LB'), days=60, hr_interval=30)
+    return tmp_path / 'archive'
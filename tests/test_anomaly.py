@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from anomaly import detect_anomalies
+
+
+def _history(values, metric='score'):
+    days = pd.date_range('2024-01-01', periods=len(values), freq='D')
+    return pd.DataFrame({'day': days, metric: values})
+
+
+def _baseline(days):
+    # Alternating 68/72: mean 70, standard deviation 2
+    return [68.0, 72.0] * (days // 2)
+
+
+def test_persisted_state_matches_full_scan(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.normal(70, 3, 90).round()
+    values[40] = 95  # a spike
+    values[60:] += 8  # a sustained shift
+    merged = _history(values)
+    merged['score_sleep'] = rng.normal(80, 5, len(merged)).round()
+    merged.loc[[10, 11, 50], 'score_sleep'] = np.nan
+    state_path = tmp_path / 'anomaly_state.json'
+
+    found = []
+    # Each export repeats the whole history; some runs see no new day
+    for days in [5, 20, 20, 21, 40, 41, 41, 55, 60, 63, 66, 67, 67, 90]:
+        history = merged.iloc[:days]
+        anomalies = detect_anomalies(history, state_path=state_path)
+        assert anomalies == detect_anomalies(history)
+        found.extend(anomalies)
+    assert {anomaly['kind'] for anomaly in found} == {'spike', 'shift'}
+
+
+def test_outlier_is_a_spike():
+    anomalies = detect_anomalies(_history(_baseline(30) + [70 + 3.5 * 2]))
+
+    assert [(a['metric'], a['kind'], a['direction']) for a in anomalies] == [('score', 'spike', 'up')]
+    assert anomalies[0]['zscore'] >= 3
+
+
+def test_sustained_level_change_is_a_shift():
+    values = _baseline(30) + [74.0] * 10
+
+    anomalies = [a for days in range(31, len(values) + 1) for a in detect_anomalies(_history(values[:days]))]
+
+    assert anomalies
+    assert {(a['kind'], a['direction']) for a in anomalies} == {('shift', 'up')}
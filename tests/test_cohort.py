@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cohort import build_cohort_index, cohort_percentile, compute_cohort_stats, user_cohort_table, user_medians
+from generate_data import generate_user
+
+
+def _long(user, values, metric='score'):
+    return pd.DataFrame({'user': user, 'day': pd.date_range('2024-01-01', periods=len(values)),
+                         'metric': metric, 'value': [float(v) for v in values]})
+
+
+def test_each_user_counts_once():
+    # One user with a long history of low scores, four with a single week of high ones
+    users = ['MALE_6_FT_180_LB_0', 'MALE_6_FT_181_LB_1', 'MALE_6_FT_182_LB_2', 'MALE_6_FT_183_LB_3',
+             'MALE_6_FT_184_LB_4']
+    long_df = pd.concat([_long(users[0], [40] * 365)] + [_long(user, [80 + i] * 7) for i, user in enumerate(users[1:])],
+                        ignore_index=True)
+
+    index = compute_cohort_stats(long_df, user_cohort_table(users))
+
+    entry = index['male|6ft|180-199lb']['score']
+    assert entry['n_users'] == 5
+    assert entry['median'] == 81
+    assert entry['quantiles'][0] == 40 and entry['quantiles'][-1] == 83
+
+
+def test_user_value_is_median_of_latest_days():
+    users = ['FEMALE_5_FT_130_LB']
+    long_df = _long(users[0], [10] * 30 + [70, 71, 72, 73, 74, 75, 76])
+
+    index = compute_cohort_stats(long_df, user_cohort_table(users))
+
+    assert index['female']['score']['median'] == 73
+    assert set(index) == {'female|5ft|120-139lb', 'female', 'all'}
+
+
+def test_lookup_value_is_the_indexed_user_value():
+    merged_df = pd.DataFrame({'day': pd.date_range('2024-01-01', periods=37),
+                              'score': [10.0] * 30 + [70, 71, np.nan, 73, 74, 75, 76],
+                              'steps': [5000.0] * 33 + [np.nan] * 4})
+    long_df = merged_df.melt(id_vars='day', var_name='metric').dropna(subset=['value'])
+    long_df.insert(0, 'user', 'FEMALE_5_FT_130_LB')
+
+    index = compute_cohort_stats(long_df, user_cohort_table(['FEMALE_5_FT_130_LB']))
+
+    # Missing days are skipped on both sides, so the lookup reaches back past them
+    assert user_medians(merged_df) == {'score': 73.0, 'steps': 5000.0}
+    assert user_medians(merged_df) == {metric: entry['median'] for metric, entry in index['all'].items()}
+
+
+def test_cohort_index_lookup(tmp_path):
+    archive = tmp_path / 'archive'
+    for i, profile in enumerate(['MALE_6_FT_180_LB', 'MALE_6_FT_185_LB', 'MALE_5_FT_150_LB',
+                                 'FEMALE_5_FT_130_LB', 'FEMALE_5_FT_140_LB']):
+        generate_user(str(archive / profile), days=20, seed=i, hr_interval=60)
+
+    index = build_cohort_index(str(archive))
+
+    assert index['users'] == 5
+    profile = {'gender': 'male', 'height_ft': 6, 'weight_lb': 180}
+    # Only 'all' has MIN_COHORT_USERS users, so lookups fall back to it
+    above = cohort_percentile(index, profile, 'score', 1000)
+    assert above['cohort'] == 'all' and above['percentile'] == 100
+    assert cohort_percentile(index, profile, 'score', -1)['percentile'] == 0
+    assert cohort_percentile(index, profile, 'score', index['cohorts']['all']['score']['median'])['percentile'] == \
+        pytest.approx(50, abs=10)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from data_analyzer import analyze_data, merge_daily_data
+
+
+def _processed(days, seed=0):
+    """Preprocessed daily datasets for `days` consecutive days"""
+    rng = np.random.default_rng(seed)
+    day = pd.date_range('2024-01-01', periods=days, freq='D')
+
+    def scores(**columns):
+        return pd.DataFrame({'day': day, 'score': pd.array(rng.integers(40, 100, days), dtype='Int64'),
+                             **{name: pd.array(rng.integers(1, 100, days), dtype='Int64') for name in columns}})
+
+    return {
+        'readiness': scores(contributors_hrv_balance=None, contributors_resting_heart_rate=None),
+        'sleep': scores(contributors_deep_sleep=None),
+        'activity': scores(steps=None),
+        'spo2': pd.DataFrame({'day': day, 'spo2_percentage': rng.uniform(94, 99, days)}),
+        'hr': None,
+        'hr_intraday': None
+    }
+
+
+def _chained_merge(processed_data):
+    """merge_daily_data as it was before the single concat: one pd.merge per dataset"""
+    base_dfs = [processed_data.get(key) for key in ['readiness', 'sleep', 'activity']]
+    base_df = next((df for df in base_dfs if df is not None), None)
+    if base_df is None:
+        return None
+
+    merged_df = base_df.copy()
+    if processed_data['sleep'] is not None and merged_df is not base_df:
+        merged_df = pd.merge(merged_df, processed_data['sleep'], on='day', how='outer', suffixes=('', '_sleep'))
+    if processed_data['activity'] is not None:
+        activity_cols = ['day', 'score', 'steps', 'average_met_minutes', 'total_calories',
+                         'high_activity_time', 'medium_activity_time', 'low_activity_time',
+                         'sedentary_time', 'resting_time', 'non_wear_time']
+        activity_cols = [col for col in activity_cols if col in processed_data['activity'].columns]
+        merged_df = pd.merge(merged_df, processed_data['activity'][activity_cols],
+                             on='day', how='outer', suffixes=('', '_activity'))
+    for key in ['spo2', 'hr']:
+        if processed_data[key] is not None:
+            merged_df = pd.merge(merged_df, processed_data[key], on='day', how='left')
+    return merged_df.sort_values('day').reset_index(drop=True)
+
+
+def _with_gaps(processed, seed=1):
+    """Drop a different random set of days from activity, readiness and SpO2"""
+    rng = np.random.default_rng(seed)
+    gapped = dict(processed)
+    for key in ['activity', 'readiness', 'spo2']:
+        df = processed[key]
+        gapped[key] = df[rng.random(len(df)) > 0.2].reset_index(drop=True)
+    days = processed['readiness']['day']
+    gapped['hr'] = pd.DataFrame({'day': days, 'avg_hr': rng.uniform(55, 75, len(days)),
+                                 'min_hr': rng.uniform(40, 55, len(days))}).iloc[5:]
+    return gapped
+
+
+def test_merge_matches_chained_merges():
+    processed = _with_gaps(_processed(90))
+
+    result = merge_daily_data(processed)
+
+    pd.testing.assert_frame_equal(result, _chained_merge(processed))
+
+
+def test_merge_without_readiness_suffixes_sleep_score():
+    processed = _with_gaps(_processed(40))
+    processed['readiness'] = None
+
+    result = merge_daily_data(processed)
+
+    # The chained merges joined sleep onto itself, duplicating its columns under an unsuffixed 'score'
+    old = _chained_merge(processed)
+    assert 'score' in old.columns and 'contributors_deep_sleep_sleep' in old.columns
+    # An unsuffixed 'score' means readiness downstream, so sleep's is always suffixed now
+    assert 'score' not in result.columns
+    assert list(result.columns) == ['day', 'score_sleep', 'contributors_deep_sleep', 'score_activity', 'steps',
+                                    'spo2_percentage', 'avg_hr', 'min_hr']
+    pd.testing.assert_series_equal(result['score_sleep'], old['score'], check_names=False)
+    pd.testing.assert_series_equal(result['score_activity'], old['score_activity'])
+
+
+
+def test_window_keeps_rolling_lookback():
+    processed = _processed(60)
+    full, _ = analyze_data(processed)
+    end = full['day'].iloc[40]
+
+    merged_df, recent_df = analyze_data(processed, start=end - pd.Timedelta(days=2), end=end)
+
+    assert len(merged_df) == 3 and recent_df['day'].max() == end
+    pd.testing.assert_series_equal(merged_df.iloc[-1], full.iloc[40], check_names=False)
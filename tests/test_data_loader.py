@@ -0,0 +1,188 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from anomaly import ANOMALY_METRICS
+from cohort import COHORT_METRICS
+from data_analyzer import ACTIVITY_COLUMNS, analyze_data
+from data_loader import HR_CHUNKSIZE, aggregate_heart_rate, load_user_data, preprocess_data, stream_heart_rate
+from intraday import compute_intraday_features
+from recommendation_engine import RULES
+from report_generator import METRICS, TRENDS
+
+
+def _groupby_heart_rate(path):
+    """The daily heart-rate aggregation as preprocess_data did it before streaming"""
+    hr_df = pd.read_csv(path)
+    hr_df['timestamp'] = pd.to_datetime(hr_df['timestamp'])
+    hr_df['day'] = hr_df['timestamp'].dt.date
+    hr_daily = hr_df.groupby('day').agg({'bpm': ['mean', 'min', 'max', 'std']}).reset_index()
+    hr_daily.columns = ['day', 'avg_hr', 'min_hr', 'max_hr', 'hr_variability']
+    hr_daily['day'] = pd.to_datetime(hr_daily['day'])
+    return hr_daily
+
+
+def _assert_same_daily(result, expected, **kwargs):
+    # Only the datetime resolution pandas picks for 'day' may differ
+    pd.testing.assert_frame_equal(result.astype({'day': 'datetime64[ns]'}), expected.astype({'day': 'datetime64[ns]'}),
+                                  check_exact=False, rtol=1e-12, **kwargs)
+
+
+def _write_heart_rate(path, with_missing):
+    rng = np.random.default_rng(0)
+    # Three busy days with irregular sample counts, then a day with a single sample
+    timestamps = [ts for day, n in [('2024-01-01', 17), ('2024-01-02', 5), ('2024-01-03', 11)]
+                  for ts in pd.date_range(day, periods=n, freq='37min')]
+    timestamps.append(pd.Timestamp('2024-01-04 08:00'))
+    df = pd.DataFrame({'timestamp': [ts.strftime('%Y-%m-%dT%H:%M:%S+02:00') for ts in timestamps],
+                       'bpm': rng.integers(45, 160, len(timestamps)).astype('float64'),
+                       'source': 'awake'})
+    if with_missing:
+        df.loc[[0, 6, 20], 'bpm'] = np.nan
+    df.to_csv(path, index=False, float_format='%.0f')
+    return path
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 7, 16, 1000])
+def test_aggregate_heart_rate_matches_groupby(tmp_path, chunksize):
+    path = _write_heart_rate(tmp_path / 'oura_heart-rate_2024-01-05T00-00-00.csv', with_missing=True)
+    expected = _groupby_heart_rate(path)
+
+    result = aggregate_heart_rate(path, chunksize)
+
+    _assert_same_daily(result, expected)
+    assert np.isnan(result['hr_variability'].iloc[-1])  # a single sample has no spread
+
+
+def test_aggregate_heart_rate_min_max_are_float(tmp_path):
+    # Without missing samples the old groupby kept integer bpm as int64; the streamed
+    # min/max are float64 with the same values
+    path = _write_heart_rate(tmp_path / 'oura_heart-rate_2024-01-05T00-00-00.csv', with_missing=False)
+    expected = _groupby_heart_rate(path)
+
+    result = aggregate_heart_rate(path, chunksize=4)
+
+    assert expected['min_hr'].dtype == 'int64' and expected['max_hr'].dtype == 'int64'
+    assert result['min_hr'].dtype == 'float64' and result['max_hr'].dtype == 'float64'
+    _assert_same_daily(result, expected, check_dtype=False)
+
+
+def test_aggregate_heart_rate_empty(tmp_path):
+    path = tmp_path / 'oura_heart-rate_2024-01-05T00-00-00.csv'
+    path.write_text("timestamp,bpm,source\n")
+
+    result = aggregate_heart_rate(path, chunksize=10)
+
+    assert result.empty
+    assert list(result.columns) == ['day', 'avg_hr', 'min_hr', 'max_hr', 'hr_variability']
+
+
+@pytest.mark.parametrize('chunksize', [1, 5, 1000])
+def test_stream_heart_rate_matches_separate_passes(tmp_path, chunksize):
+    path = _write_heart_rate(tmp_path / 'oura_heart-rate_2024-01-05T00-00-00.csv', with_missing=True)
+
+    daily, intraday = stream_heart_rate(path, chunksize)
+
+    pd.testing.assert_frame_equal(daily, aggregate_heart_rate(path, chunksize))
+    pd.testing.assert_frame_equal(intraday, compute_intraday_features(pd.read_csv(path)), check_exact=False, rtol=1e-9)
+
+
+def test_cold_load_reads_heart_rate_export_once(archive, monkeypatch):
+    reads = []
+    real_read_csv = pd.read_csv
+    monkeypatch.setattr(data_loader.pd, 'read_csv', lambda path, *args, **kwargs:
+                        reads.append(str(path)) or real_read_csv(path, *args, **kwargs))
+
+    data = load_user_data(str(archive / 'MALE_6_FT_180_LB'), hr_chunksize=HR_CHUNKSIZE)
+
+    assert len([path for path in reads if 'heart-rate' in path]) == 1
+    assert not data['hr_daily'].empty and not data['hr_intraday'].empty
+
+
+def _count_reads(monkeypatch):
+    reads = []
+    real_read_csv = pd.read_csv
+    monkeypatch.setattr(data_loader.pd, 'read_csv', lambda path, *args, **kwargs:
+                        reads.append(os.path.basename(str(path))) or real_read_csv(path, *args, **kwargs))
+    return reads
+
+
+def test_warm_load_is_served_from_cache(archive, monkeypatch):
+    user_dir = str(archive / 'MALE_6_FT_180_LB')
+    cold = load_user_data(user_dir)
+    reads = _count_reads(monkeypatch)
+
+    warm = load_user_data(user_dir)
+
+    assert reads == []
+    for key, df in cold.items():
+        pd.testing.assert_frame_equal(warm[key], df)
+
+
+@pytest.mark.parametrize('change', ['mtime', 'size'])
+def test_changed_export_is_reread(archive, monkeypatch, change):
+    user_dir = archive / 'MALE_6_FT_180_LB'
+    load_user_data(str(user_dir))
+    path = next(user_dir.glob('oura_daily-sleep_*.csv'))
+    stat = path.stat()
+    if change == 'mtime':
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    else:
+        # A trailing blank line changes the size but not the parsed rows; keep the mtime
+        with open(path, 'a') as f:
+            f.write('\n')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    reads = _count_reads(monkeypatch)
+
+    load_user_data(str(user_dir))
+
+    assert reads == [path.name]
+
+
+def test_new_export_prunes_superseded_cache_entries(archive):
+    user_dir = archive / 'MALE_6_FT_180_LB'
+    load_user_data(str(user_dir))
+    old = next(user_dir.glob('oura_daily-sleep_*.csv'))
+    new = user_dir / 'oura_daily-sleep_2099-01-01T00-00-00.csv'
+    shutil.copy(old, new)
+
+    load_user_data(str(user_dir))
+
+    cached = os.listdir(user_dir / data_loader.CACHE_DIR)
+    assert not [name for name in cached if name.startswith(old.name)]
+    assert {new.name + '.json', new.name + '.parquet'} <= set(cached)
+    # Other datasets keep their entries
+    assert [name for name in cached if name.startswith('oura_daily-readiness_')]
+
+
+def _consumed_columns():
+    """Every merged column named in the analysis, rule, report, cohort and anomaly tables"""
+    columns = set(ACTIVITY_COLUMNS) | set(METRICS) | set(TRENDS) | set(COHORT_METRICS) | set(ANOMALY_METRICS)
+    for rule in RULES:
+        columns.update(col for col, _, _ in rule['when'])
+        if rule['value'] is not None:
+            columns.add(rule['value'][0])
+    return columns
+
+
+def _analyzed_columns(user_dir):
+    shutil.rmtree(os.path.join(user_dir, data_loader.CACHE_DIR), ignore_errors=True)
+    merged_df, _ = analyze_data(preprocess_data(load_user_data(user_dir, hr_chunksize=HR_CHUNKSIZE)))
+    return set(merged_df.columns)
+
+
+def test_required_columns_cover_consumed_columns(archive, monkeypatch):
+    user_dir = str(archive / 'MALE_6_FT_180_LB')
+    projected = _analyzed_columns(user_dir)
+    with monkeypatch.context() as m:
+        m.setattr(data_loader, '_csv_projection', lambda key: {})
+        unprojected = _analyzed_columns(user_dir)
+
+    consumed = _consumed_columns()
+    # The generated exports carry every consumed column, so a full read must produce them all
+    assert consumed - unprojected == set()
+    assert consumed - projected == set()
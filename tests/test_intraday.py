@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from intraday import RECOVERY_MINUTES, RECOVERY_TOLERANCE_MINUTES, compute_intraday_features
+
+
+def _night(freq):
+    """One night at 60 bpm with 30 minutes at 50 bpm and a shorter, deeper 10-minute dip to 40"""
+    timestamps = pd.date_range('2024-01-01 00:00', '2024-01-01 06:00', freq=freq, inclusive='left')
+    bpm = np.full(len(timestamps), 60.0)
+    bpm[(timestamps >= '2024-01-01 02:00') & (timestamps < '2024-01-01 02:30')] = 50
+    bpm[(timestamps >= '2024-01-01 03:00') & (timestamps < '2024-01-01 03:10')] = 40
+    return pd.DataFrame({'timestamp': timestamps, 'bpm': bpm})
+
+
+@pytest.mark.parametrize('freq', ['1min', '5min'])
+def test_resting_window_is_thirty_minutes_at_any_cadence(freq):
+    features = compute_intraday_features(_night(freq))
+
+    assert features.loc[0, 'night_resting_hr'] == 50
+
+
+def _peak_and_follow_up(gap_minutes):
+    timestamps = pd.to_datetime(['2024-01-01 12:00', '2024-01-01 12:00'])
+    timestamps += pd.to_timedelta([0, gap_minutes], unit='min')
+    return pd.DataFrame({'timestamp': timestamps, 'bpm': [150.0, 120.0]})
+
+
+def test_recovery_slope_within_tolerance():
+    gap = RECOVERY_MINUTES + RECOVERY_TOLERANCE_MINUTES
+
+    features = compute_intraday_features(_peak_and_follow_up(gap))
+
+    assert features.loc[0, 'hr_recovery_slope'] == pytest.approx(-30 / gap)
+
+
+def test_recovery_slope_missing_when_follow_up_is_late():
+    features = compute_intraday_features(_peak_and_follow_up(RECOVERY_MINUTES + RECOVERY_TOLERANCE_MINUTES + 1))
+
+    assert np.isnan(features.loc[0, 'hr_recovery_slope'])
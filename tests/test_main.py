@@ -0,0 +1,18 @@
+import json
+
+import main
+
+
+def test_trace_records_pipeline_stages(archive, tmp_path):
+    trace_path = tmp_path / 'trace.json'
+
+    assert main.main(['MALE_6_FT_180_LB', '--archive', str(archive), '--trace', str(trace_path),
+                      '--no-save', '--quiet']) == 0
+
+    stages = [record['stage'] for record in json.loads(trace_path.read_text())['stages']]
+    assert {'load', 'preprocess', 'analyze'} <= set(stages)
+
+
+def test_unknown_user(archive, capsys):
+    assert main.main(['NOBODY', '--archive', str(archive), '--no-save']) == 1
+    assert "No user profile NOBODY" in capsys.readouterr().out
@@ -0,0 +1,16 @@
+import json
+
+import pandas as pd
+
+from pipeline import analyze_user, run_pipeline
+
+
+def test_windowed_report_matches_full_run_on_its_last_day(archive):
+    user_dir = str(archive / 'MALE_6_FT_180_LB')
+    last_day = analyze_user(user_dir)[1]['day'].max()
+    start = (last_day - pd.Timedelta(days=2)).strftime('%Y-%m-%d')
+
+    full = json.loads(run_pipeline(user_dir, 'json'))
+    windowed = json.loads(run_pipeline(user_dir, 'json', start=start, end=last_day.strftime('%Y-%m-%d')))
+
+    assert windowed == full
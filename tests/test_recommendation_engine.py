@@ -0,0 +1,17 @@
+from pipeline import analyze_user
+from recommendation_engine import evaluate_rules, evaluate_rules_row
+
+
+def test_row_evaluation_matches_vectorized(archive):
+    merged_df = analyze_user(str(archive / 'MALE_6_FT_180_LB'))[1]
+    # Missing values take a different path in each evaluator
+    merged_df.loc[5:9, ['score_sleep', 'contributors_hrv_balance', 'sleep_trend']] = None
+
+    fired = evaluate_rules(merged_df)
+
+    by_day = {day: list(zip(rows['kind'], rows['section'], rows['message']))
+              for day, rows in fired.groupby('day', sort=False)}
+    for row in merged_df.to_dict('records'):
+        assert evaluate_rules_row(row) == by_day.get(row['day'], [])
+    # Enough of the table fires on the generated history for the comparison to mean something
+    assert fired['rule_id'].nunique() >= 10
@@ -0,0 +1,10 @@
+import pytest
+
+from report_generator import _peer_line
+
+
+@pytest.mark.parametrize('percentile, shown', [(100, '99th'), (0, '1st'), (42, '42nd')])
+def test_peer_line_never_claims_the_whole_cohort(percentile, shown):
+    peer = {'label': 'sleep score', 'percentile': percentile, 'cohort_label': 'all users', 'cohort_median': 76.5}
+
+    assert _peer_line(peer) == f"Sleep score: {shown} percentile of all users (cohort median 76.5)"
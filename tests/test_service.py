@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import service
+from service import ReportService
+
+
+def _get(app, path):
+    return asyncio.run(app.handle('GET', path))
+
+
+def test_report_is_cached_until_exports_change(archive, monkeypatch):
+    builds = []
+    real_build = service._build_entry
+    monkeypatch.setattr(service, '_build_entry', lambda *args: builds.append(args) or real_build(*args))
+    app = ReportService(str(archive))
+
+    status, report = _get(app, '/users/MALE_6_FT_180_LB/report')
+    assert status == 200 and report['user'] == 'MALE_6_FT_180_LB' and report['text']
+    assert _get(app, '/users/MALE_6_FT_180_LB/report') == (200, report)
+    assert len(builds) == 1
+    assert app.cache.nbytes == app.cache.entries['MALE_6_FT_180_LB']['nbytes'] > 0
+
+    export = next(path for path in os.listdir(archive / 'MALE_6_FT_180_LB') if 'daily-sleep' in path)
+    os.utime(archive / 'MALE_6_FT_180_LB' / export, ns=(0, 0))
+    assert _get(app, '/users/MALE_6_FT_180_LB/report')[0] == 200
+    assert len(builds) == 2
+
+
+def test_user_listing_rescans_only_when_archive_changes(archive, monkeypatch):
+    scans = []
+    real_discover = service.discover_user_directories
+    monkeypatch.setattr(service, 'discover_user_directories', lambda path: scans.append(path) or real_discover(path))
+    app = ReportService(str(archive))
+
+    assert _get(app, '/users') == (200, {'users': ['MALE_6_FT_180_LB']})
+    assert _get(app, '/users/NOBODY/report')[0] == 404
+    assert len(scans) == 1
+
+    (archive / 'FEMALE_5_FT_130_LB').mkdir()
+    os.utime(archive, ns=(0, 0))
+    assert _get(app, '/users') == (200, {'users': ['FEMALE_5_FT_130_LB', 'MALE_6_FT_180_LB']})
+    assert len(scans) == 2
@@ -0,0 +1,59 @@
+import os
+
+import utils
+from utils import find_latest_file, index_directory
+
+PATTERNS = {'sleep': r'oura_daily-sleep_.*\.csv$', 'hr': r'oura_heart-rate_.*\.csv$'}
+
+
+def _touch(directory, *names):
+    for name in names:
+        (directory / name).write_text("")
+
+
+def _count_scans(monkeypatch):
+    scans = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(utils.os, 'scandir', lambda path: scans.append(path) or real_scandir(path))
+    return scans
+
+
+def test_index_directory_picks_latest_export(tmp_path):
+    _touch(tmp_path, 'oura_daily-sleep_2024-01-01T00-00-00.csv', 'oura_daily-sleep_2024-02-01T00-00-00.csv',
+           'oura_heart-rate_2024-01-15T00-00-00.csv', 'notes.txt')
+
+    assert index_directory(tmp_path, PATTERNS) == {
+        'sleep': os.path.join(tmp_path, 'oura_daily-sleep_2024-02-01T00-00-00.csv'),
+        'hr': os.path.join(tmp_path, 'oura_heart-rate_2024-01-15T00-00-00.csv')
+    }
+
+
+def test_alternating_pattern_sets_reuse_their_indexes(tmp_path, monkeypatch):
+    _touch(tmp_path, 'oura_daily-sleep_2024-01-01T00-00-00.csv', 'oura_heart-rate_2024-01-15T00-00-00.csv')
+    scans = _count_scans(monkeypatch)
+
+    for _ in range(3):
+        index_directory(tmp_path, PATTERNS)
+        find_latest_file(tmp_path, PATTERNS['hr'])
+
+    assert len(scans) == 2
+
+
+def test_directory_change_invalidates_index(tmp_path):
+    _touch(tmp_path, 'oura_daily-sleep_2024-01-01T00-00-00.csv')
+    index_directory(tmp_path, PATTERNS)
+    _touch(tmp_path, 'oura_daily-sleep_2024-03-01T00-00-00.csv')
+    os.utime(tmp_path, ns=(0, 0))  # make sure the mtime differs even on coarse-grained filesystems
+
+    assert index_directory(tmp_path, PATTERNS)['sleep'].endswith('2024-03-01T00-00-00.csv')
+
+
+def test_index_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'DIRECTORY_INDEX_LIMIT', 3)
+    monkeypatch.setattr(utils, '_directory_indexes', utils.OrderedDict())
+    for i in range(5):
+        (tmp_path / str(i)).mkdir()
+        index_directory(tmp_path / str(i), PATTERNS)
+
+    assert len(utils._directory_indexes) == 3
+    assert [key[0] for key in utils._directory_indexes] == [os.path.abspath(tmp_path / str(i)) for i in [2, 3, 4]]